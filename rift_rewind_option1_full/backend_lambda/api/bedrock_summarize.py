@@ -3,6 +3,9 @@ import boto3, json, os
 MODEL_ID = os.environ.get("BEDROCK_MODEL", "anthropic.claude-3-haiku-20240307-v1:0")
 bedrock = boto3.client("bedrock-runtime")
 
+def bedrock_client():
+    return bedrock
+
 SYSTEM = (
   "You are a concise League of Legends coach. Compare CURRENT vs HISTORICAL with the SAME lineup. "
   "Use only provided JSON. Output ≤120 words and exactly three bullet action items. No fluff."
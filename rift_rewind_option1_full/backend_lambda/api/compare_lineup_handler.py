@@ -1,64 +1,187 @@
 # rift_rewind_option1_full/backend_lambda/api/compare_lineup_handler.py
-import os, json, hashlib
+import os, json, time, calendar
 import boto3
+from boto3.dynamodb.conditions import Key
+import lineups
+import sketches
 from .bedrock_summarize import bedrock_client  # reuse client factory if you have one
 
 DDB = boto3.resource("dynamodb")
 TABLE_NAME = os.environ.get("LINEUP_INDEX_TABLE", "rr_lineup_index")  # set in Lambda env
-
-def canon_role(role: str) -> str:
-    r = (role or "").strip().upper()
-    # normalize common variants
-    if r in ("TOP", "TOPLANE"): return "TOP"
-    if r in ("JUNGLE", "JG"): return "JUNGLE"
-    if r in ("MID", "MIDLANE"): return "MID"
-    if r in ("ADC", "BOT", "BOTTOM"): return "ADC"
-    if r in ("SUPPORT", "SUP"): return "SUPPORT"
-    return "MID"
-
-def canon_champ(name: str) -> str:
-    return (name or "").strip().upper().replace(" ", "")
+# history window start; defaults to Jan 1 of the current year (season start)
+SINCE_MS = os.environ.get("LINEUP_SINCE_MS")
+MAX_HISTORY = int(os.environ.get("LINEUP_MAX_HISTORY", "200"))
+PAGE_LIMIT = 50
+SUMMARY_FIELDS = "match_id, start_ms, duration_s, summary_row"
+ROLLUP_START_MS = 0  # per-lineup all-time rollup row written by index_builder
+SKETCH_TABLE = os.environ.get("LINEUP_SKETCH_TABLE", "rr_lineup_sketches")
 
 def lineup_key(payload: dict) -> str:
     # Expect payload["teams"] 10 players with side/role/champ
-    blue = []
-    red = []
-    for p in payload.get("teams", []):
-        side = p.get("side", "BLUE").upper()
-        role = canon_role(p.get("role", "MID"))
-        champ = canon_champ(p.get("champ", ""))
-        item = f"{role}:{champ}"
-        if side == "RED":
-            red.append(item)
-        else:
-            blue.append(item)
-    blue.sort()
-    red.sort()
-    key_str = "|".join(blue) + "||" + "|".join(red)
-    return hashlib.sha1(key_str.encode()).hexdigest()
+    return lineups.key_to_hex(lineups.lineup_key(lineups.seats_from_teams(payload.get("teams"))))
+
+class BadRequest(ValueError):
+    pass
+
+def _int_param(payload: dict, name: str, default: int) -> int:
+    raw = payload.get(name)
+    if raw in (None, ""):
+        return int(default)
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        raise BadRequest(f"{name} must be an integer") from None
+
+def _lineup_error(e: Exception) -> dict:
+    if isinstance(e, lineups.UnknownChampionError):
+        return {"found": False, "error": "unknown_champion", "champion": e.champ}
+    return {"found": False, "error": "invalid_lineup", "detail": str(e)}
+
+def _season_start_ms() -> int:
+    if SINCE_MS:
+        return int(SINCE_MS)
+    return calendar.timegm((time.gmtime().tm_year, 1, 1, 0, 0, 0)) * 1000
+
+def query_lineup_history(table, key: str, since_ms: int, until_ms: int, max_matches: int = MAX_HISTORY):
+    # newest first; only the summary columns, paged so one hot lineup can't blow the budget
+    rows = []
+    kwargs = {
+        "KeyConditionExpression": Key("lineup_key").eq(key) & Key("start_ms").between(since_ms, until_ms),
+        "ProjectionExpression": SUMMARY_FIELDS,
+        "ScanIndexForward": False,
+    }
+    while len(rows) < max_matches:
+        kwargs["Limit"] = min(PAGE_LIMIT, max_matches - len(rows))
+        res = table.query(**kwargs)
+        rows.extend(res.get("Items", []))
+        if "LastEvaluatedKey" not in res:
+            break
+        kwargs["ExclusiveStartKey"] = res["LastEvaluatedKey"]
+    return rows
+
+def _aggregate_history(rows: list) -> dict:
+    n = len(rows)
+    if not n:
+        return {"games": 0}
+    totals = {"BLUE": {}, "RED": {}}
+    blue_wins = 0
+    duration = 0.0
+    for r in rows:
+        summ = json.loads(r["summary_row"])
+        duration += float(r.get("duration_s", summ.get("duration_s", 0)))
+        for side, side_key in (("BLUE", "blue"), ("RED", "red")):
+            stats = summ.get(side_key, {})
+            for stat in ("kills", "deaths", "assists", "cs", "gold"):
+                totals[side][stat] = totals[side].get(stat, 0.0) + float(stats.get(stat, 0))
+        if summ.get("blue", {}).get("win"):
+            blue_wins += 1
+    return {
+        "games": n,
+        "blue_wins": blue_wins,
+        "blue_winrate": round(blue_wins / float(n) * 100.0, 1),
+        "avg_duration_s": round(duration / n, 1),
+        "avg_blue": {k: round(v / n, 1) for k, v in totals["BLUE"].items()},
+        "avg_red": {k: round(v / n, 1) for k, v in totals["RED"].items()},
+        "latest_match_id": rows[0].get("match_id"),
+        "first_start_ms": int(rows[-1]["start_ms"]),
+        "last_start_ms": int(rows[0]["start_ms"]),
+    }
+
+def load_peer_quantiles(key: str, tier: str = "ALL", role: str = "ALL"):
+    # one sketch per side; rows indexed without a tier only feed the ALL roll-up
+    table = DDB.Table(SKETCH_TABLE)
+    out = {}
+    for side in lineups.SIDES:
+        for t in dict.fromkeys((tier or "ALL", "ALL")):
+            try:
+                item = table.get_item(Key={"sketch_key": sketches.sketch_key(key, side, t, role)}).get("Item")
+            except Exception:
+                return None  # sketch table missing/throttled: same as no sketch, like handler._load_peer_sketch
+            if item:
+                stats = sketches.PeerStats.from_bytes(item["blob"].value)
+                out[side] = {"tier": t, "games": stats.games, "medians": stats.medians(), "percentiles": stats.percentiles()}
+                break
+    return out or None
+
+def batch_lineup_rollups(keys: list) -> dict:
+    """All-time rollup rows for several lineup keys in one batch_get_item round trip (per 100 keys)."""
+    out = {}
+    uniq = list(dict.fromkeys(keys))
+    for i in range(0, len(uniq), 100):
+        request = {
+            TABLE_NAME: {
+                "Keys": [{"lineup_key": k, "start_ms": ROLLUP_START_MS} for k in uniq[i:i + 100]],
+            }
+        }
+        for _ in range(5):
+            res = DDB.batch_get_item(RequestItems=request)
+            for item in res.get("Responses", {}).get(TABLE_NAME, []):
+                games = int(item.get("games", 0))
+                out[item["lineup_key"]] = {
+                    "games": games,
+                    "blue_wins": int(item.get("blue_wins", 0)),
+                    "blue_winrate": round(int(item.get("blue_wins", 0)) / float(games) * 100.0, 1) if games else 0.0,
+                    "avg_duration_s": round(float(item.get("duration_s_sum", 0)) / games, 1) if games else 0.0,
+                }
+            request = res.get("UnprocessedKeys") or {}
+            if not request:
+                break
+            time.sleep(0.1)
+    return out
+
+def handle_compare_lineups_batch(payload: dict):
+    # payload["lineups"]: list of team lists, same shape as payload["teams"]
+    keys, results = [], []
+    for teams in payload.get("lineups", []):
+        try:
+            keys.append(lineup_key({"teams": teams}))
+        except lineups.LineupError as e:
+            keys.append(None)
+            results.append(_lineup_error(e))
+            continue
+        results.append(None)
+    rollups = batch_lineup_rollups([k for k in keys if k])
+    return {
+        "results": [
+            r or {"lineup_key": k, "found": k in rollups, "historical": rollups.get(k, {"games": 0})}
+            for k, r in zip(keys, results)
+        ]
+    }
 
 def handle_compare_lineup(payload: dict):
-    key = lineup_key(payload)
+    try:
+        key = lineup_key(payload)
+    except lineups.LineupError as e:
+        return _lineup_error(e)
     table = DDB.Table(TABLE_NAME)
 
-    # lookup exact lineup
-    ddb_item = table.get_item(Key={"lk": key}).get("Item")
-    if not ddb_item:
-        return {"found": False}
+    since_ms = _int_param(payload, "since_ms", _season_start_ms())
+    until_ms = _int_param(payload, "until_ms", time.time() * 1000)
+    max_matches = max(1, min(MAX_HISTORY, _int_param(payload, "max_matches", MAX_HISTORY)))
+
+    # range over the lineup partition instead of a single arbitrary sample
+    rows = query_lineup_history(table, key, max(since_ms, ROLLUP_START_MS + 1), until_ms, max_matches)
+    if not rows:
+        return {"found": False, "lineup_key": key}
 
-    match_id = ddb_item.get("matchId")
+    historical = _aggregate_history(rows)
+    tier = (payload.get("tier") or "ALL").upper()
+    historical["peer_quantiles"] = load_peer_quantiles(key, tier)
+    match_id = historical["latest_match_id"]
     meta = {
         "queue_id": payload.get("queue_id"),
         "duration_s": payload.get("duration_s"),
         "match_id": match_id,
+        "since_ms": since_ms,
+        "until_ms": until_ms,
     }
 
     # ask Bedrock for a concise comparison sentence
     client = bedrock_client()
     prompt = {
-        "instruction": "Write a 120-word coaching blurb comparing the current lineup to the historical match.",
+        "instruction": "Write a 120-word coaching blurb comparing the current lineup to the historical matches with the same lineup.",
         "current": payload,
-        "historical": ddb_item.get("meta", {}),
+        "historical": historical,
     }
     # Replace with your model invocation helper; here use Converse API style pseudo-call:
     text = json.dumps(prompt)  # fallback in case model call not wired yet
@@ -75,8 +198,40 @@ def handle_compare_lineup(payload: dict):
 
     return {
         "found": True,
+        "lineup_key": key,
         "match_id": match_id,
         "distance": 0.0,
         "summary": text,
+        "historical": historical,
         "meta": meta,
     }
+
+def _json_response(status: int, body: dict):
+    return {
+        "statusCode": status,
+        "headers": {"Content-Type": "application/json"},
+        "body": json.dumps(body, default=str),
+    }
+
+def handler(event, context):
+    """
+    router entry for action=compareLineup and action=compareLineups.
+    body: {"action": ..., "teams": [...]} or {"action": ..., "lineups": [[...], ...]}
+    """
+    params = event.get("queryStringParameters") or {}
+    try:
+        body = json.loads(event.get("body") or "{}")
+    except ValueError:
+        return _json_response(400, {"error": "body must be JSON"})
+    if not isinstance(body, dict):
+        return _json_response(400, {"error": "body must be a JSON object"})
+    action = (params.get("action") or body.get("action") or "").lower()
+    payload = body.get("current_match") or body
+    if not isinstance(payload, dict):
+        return _json_response(400, {"error": "current_match must be a JSON object"})
+    try:
+        if action == "comparelineups":
+            return _json_response(200, handle_compare_lineups_batch(payload))
+        return _json_response(200, handle_compare_lineup(payload))
+    except BadRequest as e:
+        return _json_response(400, {"error": str(e)})
@@ -3,19 +3,52 @@ import json
 import os
 import time
 import random
-import urllib.request
 import urllib.parse
 import urllib.error
 import statistics
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeout
 import boto3
+from botocore.config import Config
+
+import lineups
+import riot_http
+import sketches
+from ladder_snapshot import ladder_snapshot
 
 # ===== Env =====
 RIOT_API_KEY = os.environ.get("RIOT_API_KEY", "")
 DEFAULT_ROUTING_REGION = os.environ.get("RIOT_REGION_ROUTING", "americas")
 BEDROCK_REGION = os.environ.get("BEDROCK_REGION", "us-east-1")
 MODEL_ID = os.environ.get("MODEL_ID", "anthropic.claude-3-haiku-20240307-v1:0")
-
-bedrock = boto3.client("bedrock-runtime", region_name=BEDROCK_REGION)
+SKETCH_TABLE = os.environ.get("LINEUP_SKETCH_TABLE", "rr_lineup_sketches")
+SKETCH_MIN_GAMES = int(os.environ.get("SKETCH_MIN_GAMES", "20"))
+LADDER_SNAPSHOT_TTL_S = int(os.environ.get("LADDER_SNAPSHOT_TTL_S", "600"))
+# older snapshots are ignored and compare crawls the ladder live instead
+LADDER_SNAPSHOT_MAX_AGE_S = int(os.environ.get("LADDER_SNAPSHOT_MAX_AGE_S", "172800"))
+SNAPSHOT_SCAN_CAP = int(os.environ.get("SNAPSHOT_SCAN_CAP", "200"))
+MATCH_CACHE_SIZE = int(os.environ.get("MATCH_CACHE_SIZE", "256"))
+RECAP_BATCH_MAX = int(os.environ.get("RECAP_BATCH_MAX", "10"))
+RECAP_BATCH_WORKERS = int(os.environ.get("RECAP_BATCH_WORKERS", "6"))
+RECAP_BATCH_RETRIES = int(os.environ.get("RECAP_BATCH_RETRIES", "4"))
+RECAP_BATCH_MAX_BACKOFF_S = float(os.environ.get("RECAP_BATCH_MAX_BACKOFF_S", "10"))
+COACH_BUDGET_S = float(os.environ.get("COACH_BUDGET_S", "6"))
+BEDROCK_CONNECT_TIMEOUT_S = float(os.environ.get("BEDROCK_CONNECT_TIMEOUT_S", "2"))
+BEDROCK_READ_TIMEOUT_S = float(os.environ.get("BEDROCK_READ_TIMEOUT_S", "5"))
+BEDROCK_MAX_ATTEMPTS = int(os.environ.get("BEDROCK_MAX_ATTEMPTS", "2"))
+
+bedrock = boto3.client(
+    "bedrock-runtime",
+    region_name=BEDROCK_REGION,
+    config=Config(
+        connect_timeout=BEDROCK_CONNECT_TIMEOUT_S,
+        read_timeout=BEDROCK_READ_TIMEOUT_S,
+        retries={"max_attempts": BEDROCK_MAX_ATTEMPTS, "mode": "adaptive"},
+    ),
+)
+ddb = boto3.client("dynamodb")
 
 
 # ===== HTTP util with CORS =====
@@ -33,14 +66,38 @@ def _http(status, body_dict):
     }
 
 
+def _http_ndjson(status, rows):
+    # one JSON object per line, in the order rows are produced
+    resp = _http(status, {})
+    resp["headers"]["Content-Type"] = "application/x-ndjson"
+    resp["body"] = "".join(json.dumps(r) + "\n" for r in rows)
+    return resp
+
+
 # ===== Riot HTTP =====
 def _riot_get(url):
     if not RIOT_API_KEY:
         raise RuntimeError("RIOT_API_KEY not configured")
     headers = {"X-Riot-Token": RIOT_API_KEY}
-    req = urllib.request.Request(url, headers=headers)
-    with urllib.request.urlopen(req, timeout=8) as resp:
-        return json.loads(resp.read())
+    return riot_http.get_json(url, headers=headers)
+
+
+# match documents never change, so warm containers keep the most recent ones
+_match_cache = OrderedDict()
+
+
+def _get_match(routing_region, match_id):
+    """(match, from_cache)"""
+    m = _match_cache.get(match_id)
+    if m is not None:
+        _match_cache.move_to_end(match_id)
+        return m, True
+    base = f"https://{routing_region}.api.riotgames.com/lol/match/v5"
+    m = _riot_get(f"{base}/matches/{urllib.parse.quote(match_id)}")
+    _match_cache[match_id] = m
+    while len(_match_cache) > MATCH_CACHE_SIZE:
+        _match_cache.popitem(last=False)
+    return m, False
 
 
 # ===== Request parsing =====
@@ -58,7 +115,7 @@ def _get_params(event):
 
 
 # ===== Core Riot helpers =====
-def _get_puuid_by_riot_id(game_name, tag_line, routing_region):
+def _get_puuid_by_riot_id(game_name, tag_line, routing_region, get=None):
     if not game_name or not tag_line:
         raise ValueError("missing gameName or tagLine")
     safe_name = urllib.parse.quote(game_name)
@@ -67,7 +124,7 @@ def _get_puuid_by_riot_id(game_name, tag_line, routing_region):
         f"https://{routing_region}.api.riotgames.com/riot/account/v1/accounts/"
         f"by-riot-id/{safe_name}/{safe_tag}"
     )
-    data = _riot_get(url)
+    data = (get or _riot_get)(url)
     return data["puuid"]
 
 
@@ -89,7 +146,10 @@ def _build_player_bundle(game_name, tag_line, routing_region, max_matches=10):
     puuid, matches = _load_recent_matches(
         game_name, tag_line, max_matches=max_matches, routing_region=routing_region
     )
+    return _overview_from_matches(puuid, matches)
 
+
+def _overview_from_matches(puuid, matches):
     total_games = len(matches)
     if total_games == 0:
         overview = {"games_analyzed": 0}
@@ -188,6 +248,153 @@ def _build_player_bundle(game_name, tag_line, routing_region, max_matches=10):
     return overview, recent_games
 
 
+# ===== Roster batch recap =====
+def _parse_riot_ids(raw):
+    # "Name#TAG,Name2#TAG2" or [{"gameName", "tagLine"} | "Name#TAG", ...]
+    if isinstance(raw, str):
+        raw = [r for r in raw.split(",") if r.strip()]
+    out = []
+    for r in raw or []:
+        if isinstance(r, dict):
+            name, tag = r.get("gameName"), r.get("tagLine")
+        else:
+            name, _, tag = str(r).strip().rpartition("#")
+        if name and tag:
+            out.append((name.strip(), tag.strip()))
+    return list(dict.fromkeys(out))
+
+
+class _Pacer:
+    """Shared 429 pause for the batch workers.
+
+    When one worker is rate limited every worker waits out Retry-After before
+    its next call, instead of the others spending the window on more 429s.
+    """
+
+    def __init__(self):
+        self._until = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            delay = self._until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._until = max(self._until, time.monotonic() + seconds)
+
+
+def _retry_after_s(err, attempt):
+    try:
+        delay = float(err.headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        delay = 1.3 * (2 ** attempt)
+    return min(RECAP_BATCH_MAX_BACKOFF_S, max(0.1, delay))
+
+
+def _paced_get(pacer, url):
+    for attempt in range(RECAP_BATCH_RETRIES + 1):
+        pacer.wait()
+        try:
+            return _riot_get(url)
+        except urllib.error.HTTPError as e:
+            if e.code != 429 or attempt == RECAP_BATCH_RETRIES:
+                raise
+            pacer.pause(_retry_after_s(e, attempt))
+
+
+def _resolve_roster(riot_ids, max_matches, routing_region, pool, pacer):
+    base = f"https://{routing_region}.api.riotgames.com/lol/match/v5"
+
+    def get(url):
+        return _paced_get(pacer, url)
+
+    def resolve(rid):
+        puuid = _get_puuid_by_riot_id(rid[0], rid[1], routing_region, get=get)
+        mids = get(f"{base}/matches/by-puuid/{puuid}/ids?start=0&count={max_matches}")
+        return puuid, mids
+
+    futs = {pool.submit(resolve, rid): rid for rid in riot_ids}
+    resolved, failed = {}, {}
+    for fut in as_completed(futs):
+        rid = futs[fut]
+        try:
+            resolved[rid] = fut.result()
+        except Exception as e:
+            failed[rid] = e
+    return resolved, failed
+
+
+def _iter_recap_batch(riot_ids, routing_region, max_matches=10):
+    """Yield one recap row per player as soon as all of that player's matches are in.
+
+    Match IDs are unioned across the roster so a game shared by teammates is
+    downloaded once; downloads run concurrently, ordered player by player so
+    the first players finish first. A 429 pauses all downloads for its
+    Retry-After and the call is retried, so a burst does not drop matches.
+    """
+    base = f"https://{routing_region}.api.riotgames.com/lol/match/v5"
+    pacer = _Pacer()
+    with ThreadPoolExecutor(max_workers=RECAP_BATCH_WORKERS) as pool:
+        resolved, failed = _resolve_roster(
+            riot_ids, max_matches, routing_region, pool, pacer
+        )
+        for rid, err in failed.items():
+            yield {"gameName": rid[0], "tagLine": rid[1], "error": str(err)}
+
+        waiting = {}  # match id -> riot ids still needing it
+        pending = {}  # riot id -> number of its matches not yet downloaded
+        order = []
+        for rid in riot_ids:
+            if rid not in resolved:
+                continue
+            mids = list(dict.fromkeys(resolved[rid][1]))
+            pending[rid] = len(mids)
+            for mid in mids:
+                if mid not in waiting:
+                    waiting[mid] = []
+                    order.append(mid)
+                waiting[mid].append(rid)
+
+        shared = {}
+
+        def finish(rid):
+            puuid, mids = resolved[rid]
+            matches = [shared[mid] for mid in mids if shared.get(mid)]
+            overview, recent_games = _overview_from_matches(puuid, matches)
+            return {
+                "gameName": rid[0],
+                "tagLine": rid[1],
+                "puuid": puuid,
+                "player_overview": overview,
+                "hidden_gem": "Strong " + overview.get("favorite_champion", "champion"),
+                "recent_games": recent_games,
+                "missing_matches": len(mids) - len(matches),
+            }
+
+        for rid in [r for r, n in pending.items() if n == 0]:
+            yield finish(rid)
+
+        futs = {
+            pool.submit(
+                _paced_get, pacer, f"{base}/matches/{urllib.parse.quote(mid)}"
+            ): mid
+            for mid in order
+        }
+        for fut in as_completed(futs):
+            mid = futs[fut]
+            try:
+                shared[mid] = fut.result()
+            except Exception:
+                shared[mid] = None  # retries exhausted; recap uses what did load
+            for rid in waiting[mid]:
+                pending[rid] -= 1
+                if pending[rid] == 0:
+                    yield finish(rid)
+
+
 # ===== Bedrock coaching =====
 def _call_bedrock(overview, lane_hint=None, deltas_block=None):
     sys_prompt = (
@@ -229,6 +436,190 @@ def _call_bedrock(overview, lane_hint=None, deltas_block=None):
     return text.strip()
 
 
+# ===== Rule-based coaching (fallback) =====
+_LANE_CS_TARGET = {
+    "TOP": 7.0,
+    "JUNGLE": 5.5,
+    "MIDDLE": 7.5,
+    "BOTTOM": 8.0,
+    "UTILITY": 1.5,
+}
+_LANE_HABITS = {
+    "TOP": [
+        "Track the enemy jungler before trading; play short trades when they are topside.",
+        "Freeze near your tower when ahead instead of shoving without vision.",
+    ],
+    "JUNGLE": [
+        "Plan the first clear around which lane can follow up on a gank.",
+        "Be at the next objective 45 seconds before it spawns.",
+    ],
+    "MIDDLE": [
+        "Shove the wave before roaming so you don't lose plates or farm.",
+        "Ping and follow your jungler to river skirmishes.",
+    ],
+    "BOTTOM": [
+        "Last-hit under tower cleanly; practice tower-hit math in a custom game.",
+        "Stay with the group after laning; do not side-lane alone without vision.",
+    ],
+    "UTILITY": [
+        "Spend every back on a control ward and keep one on the map.",
+        "Roam mid after your ADC backs, not while they are in lane.",
+    ],
+}
+_GENERIC_HABITS = [
+    "Review the first death of each game and name what you would change.",
+    "Check the minimap every time a wave reaches your tower.",
+    "Back with a plan: buy a completed component, not scattered gold.",
+]
+_DELTA_HABITS = {
+    "kda": "Cut one avoidable death per game: leave fights when your summoners are down.",
+    "cs_per_min": "Add 1 cs/min by catching side waves between objectives.",
+    "gold": "Turn leads into plates and objectives instead of chasing kills.",
+    "win": "Group for the next objective after every won fight instead of resetting.",
+}
+_DELTA_LABELS = {
+    "kda": "KDA",
+    "cs_per_min": "CS/min",
+    "gold": "gold",
+    "win": "win rate",
+}
+
+
+def _rule_based_coach(overview, lane_hint=None, deltas_block=None):
+    # deterministic template coach built from the same inputs as _call_bedrock
+    lane = lineups.canon_role(lane_hint)
+    strengths, weaknesses, habits = [], [], []
+    favorite = overview.get("favorite_champion") if overview.get("games_analyzed") else None
+
+    if overview.get("games_analyzed"):
+        kda = overview.get("kda", 0.0)
+        deaths = overview.get("avg_deaths", 0.0)
+        csm = overview.get("cs_per_min", 0.0)
+        wr = overview.get("winrate", 0.0)
+        target = _LANE_CS_TARGET.get(lane, 7.0)
+        if kda >= 3.0:
+            strengths.append(f"KDA {kda} shows you pick fights you can win.")
+        elif kda < 2.0:
+            weaknesses.append(f"KDA {kda} is low; too many fights end with you dead.")
+            habits.append(_DELTA_HABITS["kda"])
+        if deaths >= 6.0:
+            weaknesses.append(f"{deaths} deaths per game hands the enemy tempo.")
+            habits.append("Ward your escape path before pushing past the river.")
+        if lane != "UTILITY":
+            if csm >= target:
+                strengths.append(f"{csm} CS/min meets the {target} lane target.")
+            else:
+                weaknesses.append(f"{csm} CS/min is under the {target} lane target.")
+                habits.append(_DELTA_HABITS["cs_per_min"])
+        if wr >= 55.0:
+            strengths.append(f"{wr}% win rate over {overview['games_analyzed']} games.")
+        elif wr < 45.0:
+            weaknesses.append(f"{wr}% win rate over {overview['games_analyzed']} games.")
+
+    if deltas_block:
+        # gold deltas are in the hundreds and KDA ones below 1, so each delta is
+        # ranked relative to its peer median; win is already a rate
+        sums, rels = {}, {}
+        for row in deltas_block:
+            meds = row.get("peer_medians") or {}
+            for k, v in (row.get("deltas") or {}).items():
+                if k not in _DELTA_LABELS:
+                    continue
+                med = abs(float(meds.get(k) or 0.0))
+                scale = med if k != "win" and med > 0 else 1.0
+                sums[k] = sums.get(k, 0.0) + float(v)
+                rels[k] = rels.get(k, 0.0) + float(v) / scale
+        n = float(len(deltas_block))
+        tier = overview.get("target_tier", "higher-tier")
+        # largest relative gaps first, so the worst weakness leads the habits too
+        ranked = sorted(((rels[k] / n, sums[k] / n, k) for k in sums), key=lambda t: -abs(t[0]))
+        for rel, avg, k in ranked:
+            label = _DELTA_LABELS[k]
+            if k == "win":
+                shown = f"{avg * 100:+.0f} pts"
+            elif k == "gold":
+                shown = f"{avg:+.0f} ({rel * 100:+.0f}%)"
+            else:
+                shown = f"{avg:+.2f} ({rel * 100:+.0f}%)"
+            if avg < 0:
+                weaknesses.append(f"{label} {shown} vs {tier} medians.")
+                habits.append(_DELTA_HABITS[k])
+            elif avg > 0:
+                strengths.append(f"{label} {shown} vs {tier} medians.")
+
+    for h in _LANE_HABITS.get(lane, []) + _GENERIC_HABITS:
+        if len(habits) >= 3:
+            break
+        habits.append(h)
+    habits = list(dict.fromkeys(habits))[:5]
+
+    lines = []
+    if strengths:
+        lines.append("Strengths: " + " ".join(strengths))
+    if weaknesses:
+        lines.append("Weaknesses: " + " ".join(weaknesses))
+    if favorite:
+        lines.append(f"Most played: {favorite}.")
+    lines.append("Focus on:")
+    lines.extend(f"- {h}" for h in habits)
+    return "\n".join(lines)
+
+
+# ===== Budgeted coaching =====
+_coach_pool = ThreadPoolExecutor(max_workers=4)
+coach_latency = riot_http.LatencyTracker()
+
+
+def _coach(overview, lane_hint=None, deltas_block=None, budget_s=None):
+    """Bedrock under a latency budget, else the rule-based coach.
+
+    Returns (text, meta); meta says which path answered and how long each took.
+    """
+    budget_s = COACH_BUDGET_S if budget_s is None else budget_s
+    latency_ms = {"bedrock": None, "rules": None}
+    reason = None
+    if budget_s > 0:
+        t0 = time.monotonic()
+        fut = _coach_pool.submit(_call_bedrock, overview, lane_hint, deltas_block)
+        try:
+            text = fut.result(timeout=budget_s)
+            reason = None if text else "empty_response"
+        except FutureTimeout:
+            fut.cancel()  # a running call is bounded by the client timeouts
+            text, reason = None, "budget_exceeded"
+        except Exception as e:
+            # botocore ClientError carries a dict; other errors may have response=None
+            err = (getattr(e, "response", None) or {}).get("Error", {}).get("Code")
+            text, reason = None, err or type(e).__name__
+        elapsed = time.monotonic() - t0
+        coach_latency.record(("bedrock",), elapsed)
+        latency_ms["bedrock"] = round(elapsed * 1000.0, 1)
+        if text:
+            return text, {"coach_source": "bedrock", "coach_latency_ms": latency_ms}
+    else:
+        reason = "disabled"
+
+    t0 = time.monotonic()
+    text = _rule_based_coach(overview, lane_hint=lane_hint, deltas_block=deltas_block)
+    elapsed = time.monotonic() - t0
+    coach_latency.record(("rules",), elapsed)
+    latency_ms["rules"] = round(elapsed * 1000.0, 3)
+    return text, {
+        "coach_source": "rules",
+        "coach_latency_ms": latency_ms,
+        "coach_fallback_reason": reason,
+    }
+
+
+def _coach_budget(qs, body):
+    # per-request override, never above the configured budget
+    raw = qs.get("coachBudgetMs") or body.get("coachBudgetMs")
+    try:
+        return max(0.0, min(COACH_BUDGET_S, float(raw) / 1000.0))
+    except (TypeError, ValueError):
+        return COACH_BUDGET_S
+
+
 # ===== Compare-lineup helpers =====
 TIERS = [
     "IRON",
@@ -331,18 +722,12 @@ def list_match_ids_last_year(puuid, routing_region):
     return out
 
 
-def _participants_by_team(match):
-    parts = match.get("info", {}).get("participants", [])
-    t1 = [p for p in parts if p.get("teamId") == 100]
-    t2 = [p for p in parts if p.get("teamId") == 200]
-    return t1, t2
-
-
 def _lineup_signature(match):
-    t1, t2 = _participants_by_team(match)
-    champs1 = sorted([p.get("championName", "Unknown") for p in t1])
-    champs2 = sorted([p.get("championName", "Unknown") for p in t2])
-    return f"TEAM100:{','.join(champs1)}|TEAM200:{','.join(champs2)}"
+    # None when the lineup can't be keyed; such a match never counts as a peer
+    try:
+        return lineups.key_to_hex(lineups.lineup_key(lineups.seats_from_match(match)))
+    except lineups.LineupError:
+        return None
 
 
 def _snapshot_for_puuid(match, puuid):
@@ -362,6 +747,7 @@ def _snapshot_for_puuid(match, puuid):
                 "gold": p.get("goldEarned", 0),
                 "win": bool(p.get("win")),
                 "role": p.get("teamPosition") or p.get("role") or "",
+                "side": lineups.canon_side(p.get("teamId")) or "",
             }
     return {}
 
@@ -392,16 +778,98 @@ def _aggregate_peer_medians(matches):
     }
 
 
+def _load_peer_sketch(signature_key, side, tier, role):
+    """(PeerStats, tier it was found under) or (None, None).
+
+    Pre-aggregated by index_builder per side of the lineup: target tier before
+    the ALL roll-up (NDJSON without a "tier" field only feeds ALL),
+    role-specific before all roles. games counts matches, not participants.
+    """
+    if not signature_key or not side:
+        return None, None
+    for t in dict.fromkeys((tier or "ALL", "ALL")):
+        for r in (lineups.canon_role(role), "ALL"):
+            if not r:
+                continue
+            try:
+                item = ddb.get_item(
+                    TableName=SKETCH_TABLE,
+                    Key={"sketch_key": {"S": sketches.sketch_key(signature_key, side, t, r)}},
+                ).get("Item")
+            except Exception:
+                return None, None
+            if item and int(item["games"]["N"]) >= SKETCH_MIN_GAMES:
+                return sketches.PeerStats.from_bytes(item["blob"]["B"]), t
+    return None, None
+
+
+_ladder_cache = {}
+
+
+def _ladder_players(platform_region, tier, division):
+    key = (platform_region, tier, division)
+    hit = _ladder_cache.get(key)
+    if hit and time.time() - hit[0] < LADDER_SNAPSHOT_TTL_S:
+        return hit[1]
+    try:
+        snap = ladder_snapshot.load_snapshot(platform_region, tier, division, client=ddb)
+    except Exception:
+        snap = None
+    fresh = snap and time.time() - snap[0] <= LADDER_SNAPSHOT_MAX_AGE_S
+    players = snap[1] if fresh else []
+    _ladder_cache[key] = (time.time(), players)
+    return players
+
+
+def _sample_from_snapshot(
+    signature_key, routing_region, platform_region, target_tier, sample_cap
+):
+    # no ladder/summoner calls: match IDs were resolved by the snapshot refresher
+    mids = []
+    for div in ladder_snapshot.divisions_for(target_tier):
+        for pl in _ladder_players(platform_region, target_tier, div):
+            mids.extend(pl.get("match_ids", []))
+    if not mids:
+        return None
+    mids = list(dict.fromkeys(mids))
+    random.shuffle(mids)
+    # scan cached documents first; they cost nothing
+    mids.sort(key=lambda mid: mid not in _match_cache)
+
+    acc = []
+    for mid in mids[:SNAPSHOT_SCAN_CAP]:
+        try:
+            m, cached = _get_match(routing_region, mid)
+        except urllib.error.HTTPError as ex:
+            if ex.code == 429:
+                time.sleep(1.3)
+            continue
+        except Exception:
+            continue
+        if _lineup_signature(m) == signature_key:
+            acc.append(m)
+            if len(acc) >= sample_cap:
+                break
+        if not cached:
+            time.sleep(0.12)
+    return acc
+
+
 def _sample_peer_matches_same_lineup(
     signature_key, routing_region, platform_region, target_tier, sample_cap=40
 ):
+    if not signature_key:
+        return []
+    acc = _sample_from_snapshot(
+        signature_key, routing_region, platform_region, target_tier, sample_cap
+    )
+    if acc is not None:
+        return acc
+
+    # no snapshot yet for this ladder: crawl it live
     base = f"https://{routing_region}.api.riotgames.com/lol/match/v5"
     acc = []
-    divisions = (
-        ["I", "II", "III", "IV"]
-        if target_tier not in ["MASTER", "GRANDMASTER", "CHALLENGER"]
-        else ["I"]
-    )
+    divisions = ladder_snapshot.divisions_for(target_tier)
     for div in divisions:
         for _ in range(2):  # two pages per division
             page = random.randint(1, 5)
@@ -416,19 +884,21 @@ def _sample_peer_matches_same_lineup(
             random.shuffle(entries)
             for e in entries[:10]:  # small subset
                 try:
-                    summ_id = e["summonerId"]
-                    summ = _get_summoner_by_id(summ_id, platform_region)
-                    peer_puuid = summ["puuid"]
+                    peer_puuid = e.get("puuid")
+                    if not peer_puuid:
+                        summ = _get_summoner_by_id(e["summonerId"], platform_region)
+                        peer_puuid = summ["puuid"]
                     mids = _riot_get(
                         f"{base}/matches/by-puuid/{peer_puuid}/ids?start=0&count=10"
                     )
                     for mid in mids:
-                        m = _riot_get(f"{base}/matches/{mid}")
+                        m, cached = _get_match(routing_region, mid)
                         if _lineup_signature(m) == signature_key:
                             acc.append(m)
                             if len(acc) >= sample_cap:
                                 return acc
-                        time.sleep(0.12)
+                        if not cached:
+                            time.sleep(0.12)
                 except urllib.error.HTTPError as ex:
                     if ex.code == 429:
                         time.sleep(1.3)
@@ -475,7 +945,13 @@ def lambda_handler(event, context):
         if action == "health":
             return _http(
                 200,
-                {"ok": True, "routing": routing_region, "platform": platform_region},
+                {
+                    "ok": True,
+                    "routing": routing_region,
+                    "platform": platform_region,
+                    "riot_http": riot_http.stats(),
+                    "coach_latency": coach_latency.snapshot(),
+                },
             )
 
         # recap
@@ -507,6 +983,17 @@ def lambda_handler(event, context):
                 },
             )
 
+        # roster recap: several Riot IDs, shared match downloads
+        if action == "getRecapBatch":
+            riot_ids = _parse_riot_ids(body.get("riotIds") or qs.get("riotIds"))
+            if not riot_ids:
+                return _http(400, {"error": "missing_riot_ids"})
+            if len(riot_ids) > RECAP_BATCH_MAX:
+                return _http(400, {"error": "too_many_riot_ids", "max": RECAP_BATCH_MAX})
+            return _http_ndjson(
+                200, _iter_recap_batch(riot_ids, routing_region, max_matches=max_matches)
+            )
+
         # summarize (single-player coaching)
         if action == "summarize":
             game_name = qs.get("gameName") or body.get("gameName")
@@ -527,8 +1014,10 @@ def lambda_handler(event, context):
                 routing_region,
                 max_matches=max_matches,
             )
-            summary = _call_bedrock(overview, lane_hint=lane_hint)
-            return _http(200, {"summary": summary, "overview": overview})
+            summary, coach_meta = _coach(
+                overview, lane_hint=lane_hint, budget_s=_coach_budget(qs, body)
+            )
+            return _http(200, {"summary": summary, "overview": overview, **coach_meta})
 
         # compare lineup vs higher tier
         if action == "compare":
@@ -550,8 +1039,6 @@ def lambda_handler(event, context):
                     return _http(400, {"error": "missing_riot_id_or_puuid"})
                 puuid = _get_puuid_by_riot_id(game_name, tag_line, routing_region)
 
-            base = f"https://{routing_region}.api.riotgames.com/lol/match/v5"
-
             summ = _get_summoner_by_puuid(puuid, platform_region)
             entries = _get_rank_entries_by_summoner(summ["id"], platform_region)
             user_tier, _user_div = _pick_user_tier(entries)
@@ -561,18 +1048,29 @@ def lambda_handler(event, context):
             deltas_for_llm = []
 
             for mid in selected_ids:
-                m = _riot_get(f"{base}/matches/{urllib.parse.quote(mid)}")
+                m, _cached = _get_match(routing_region, mid)
                 sig = _lineup_signature(m)
                 user_snap = _snapshot_for_puuid(m, puuid)
 
-                peers = _sample_peer_matches_same_lineup(
-                    sig,
-                    routing_region,
-                    platform_region,
-                    target_tier,
-                    sample_cap=sample_cap,
+                peer_stats, peer_tier = _load_peer_sketch(
+                    sig, user_snap.get("side"), target_tier, user_snap.get("role")
                 )
-                peer_meds = _aggregate_peer_medians(peers)
+                if peer_stats is not None:
+                    peer_meds = peer_stats.medians()
+                    peer_pcts = peer_stats.percentiles()
+                    peer_n, peer_source = peer_stats.games, "sketch"
+                else:
+                    peer_tier = target_tier
+                    peers = _sample_peer_matches_same_lineup(
+                        sig,
+                        routing_region,
+                        platform_region,
+                        target_tier,
+                        sample_cap=sample_cap,
+                    )
+                    peer_meds = _aggregate_peer_medians(peers)
+                    peer_pcts = None
+                    peer_n, peer_source = len(peers), "sampled"
 
                 deltas = {
                     "kda": round(
@@ -600,7 +1098,10 @@ def lambda_handler(event, context):
                         "user_snapshot": user_snap,
                         "peer_medians": peer_meds,
                         "deltas": deltas,
-                        "peer_sample_size": len(peers),
+                        "peer_percentiles": peer_pcts,
+                        "peer_sample_size": peer_n,
+                        "peer_source": peer_source,
+                        "peer_tier": peer_tier,
                         "target_tier": target_tier,
                     }
                 )
@@ -615,8 +1116,11 @@ def lambda_handler(event, context):
                 "user_tier": user_tier,
                 "target_tier": target_tier,
             }
-            coaching = _call_bedrock(
-                overview_stub, lane_hint=lane_hint, deltas_block=deltas_for_llm
+            coaching, coach_meta = _coach(
+                overview_stub,
+                lane_hint=lane_hint,
+                deltas_block=deltas_for_llm,
+                budget_s=_coach_budget(qs, body),
             )
 
             return _http(
@@ -626,6 +1130,7 @@ def lambda_handler(event, context):
                     "coaching": coaching,
                     "routingRegion": routing_region,
                     "platformRegion": platform_region,
+                    **coach_meta,
                 },
             )
 
@@ -633,5 +1138,7 @@ def lambda_handler(event, context):
 
     except urllib.error.HTTPError as e:
         return _http(e.code, {"error": "riot_http_error", "detail": str(e)})
+    except riot_http.CircuitOpenError as e:
+        return _http(503, {"error": "riot_unavailable", "detail": str(e)})
     except Exception as e:
         return _http(500, {"error": "server_error", "detail": str(e)})
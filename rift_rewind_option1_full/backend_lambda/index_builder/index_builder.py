@@ -1,21 +1,15 @@
-import json, gzip, boto3
+import json, gzip, os, boto3
+import lineups
+import sketches
 
 ddb = boto3.client("dynamodb")
-TABLE = "lineup_index"
-ROLES = {"TOP", "JUNGLE", "MID", "ADC", "SUPPORT"}
-
-def canon(champ: str) -> str:
-    return champ.strip().upper().replace(" ", "").replace("'", "")
+TABLE = os.environ.get("LINEUP_INDEX_TABLE", "rr_lineup_index")
+ROLLUP_START_MS = 0  # sort key of the per-lineup rollup row (batch_get_item target)
+SKETCH_TABLE = os.environ.get("LINEUP_SKETCH_TABLE", "rr_lineup_sketches")
+SKETCH_BATCH = int(os.environ.get("LINEUP_SKETCH_BATCH", "100"))  # rows per sketch flush
 
 def lineup_key(teams):
-    tags = []
-    for t in teams:
-        side = t["side"].upper()[0]  # B or R
-        role = t["role"].upper()
-        if role not in ROLES: 
-            continue
-        tags.append(f"{side}_{role}:{canon(t['champ'])}")
-    return "|".join(sorted(tags))
+    return lineups.key_to_hex(lineups.lineup_key(lineups.seats_from_teams(teams)))
 
 def _side_stats(m, side):
     side_team = [p for p in m["teams"] if p["side"] == side]
@@ -38,22 +32,128 @@ def _summarize(m):
     }
 
 def to_ddb_item(m):
+    keys = lineups.key_variants(lineups.seats_from_teams(m["teams"]))
     return {
-        "lineup_key": {"S": lineup_key(m["teams"])},
+        "lineup_key": {"S": lineups.key_to_hex(keys["exact"])},
+        # partial-lookup variants, for GSIs keyed on side/role-agnostic lineups
+        "lineup_key_any_side": {"S": lineups.key_to_hex(keys["any_side"])},
+        "lineup_key_any_role": {"S": lineups.key_to_hex(keys["any_role"])},
         "start_ms":   {"N": str(m["start_ms"])},
         "match_id":   {"S": m["match_id"]},
         "queue_id":   {"N": str(m["queue_id"])},
         "duration_s": {"N": str(m["duration_s"])},
-        "summary_row":{"S": json.dumps(_summarize(m), separators=(",",":"))}
+        "summary_row":{"S": json.dumps(_summarize(m), separators=(",",":"))},
+        # flipped once the row's sketch contribution has been flushed
+        "sketched":   {"BOOL": False},
+    }
+
+def rollup_update(m):
+    summ = _summarize(m)
+    return {
+        "TableName": TABLE,
+        "Key": {
+            "lineup_key": {"S": lineup_key(m["teams"])},
+            "start_ms":   {"N": str(ROLLUP_START_MS)},
+        },
+        "UpdateExpression": "ADD games :one, blue_wins :bw, duration_s_sum :dur",
+        "ExpressionAttributeValues": {
+            ":one": {"N": "1"},
+            ":bw":  {"N": "1" if summ["blue"]["win"] else "0"},
+            ":dur": {"N": str(m["duration_s"])},
+        },
     }
 
+def _existing_row(exc):
+    # TransactionCanceledException lists one reason per item; the Put is first and
+    # returns the stored row (ALL_OLD) when its attribute_not_exists check fails
+    reasons = exc.response.get("CancellationReasons") or []
+    if reasons and reasons[0].get("Code") == "ConditionalCheckFailed":
+        return reasons[0].get("Item") or {}
+    return None
+
+def add_to_sketches(acc, m):
+    # per (lineup, side, tier, role) plus tier/role ALL roll-ups so callers can widen the lookup
+    lk = lineup_key(m["teams"])
+    tier = (m.get("tier") or "ALL").upper()
+    for side in lineups.SIDES:
+        team = [p for p in m["teams"] if (lineups.canon_side(p.get("side")) or "BLUE") == side]
+        touched = set()
+        for p in team:
+            role = lineups.canon_role(p.get("role")) or "ALL"
+            for t in {tier, "ALL"}:
+                for r in {role, "ALL"}:
+                    skey = sketches.sketch_key(lk, side, t, r)
+                    if skey not in acc:
+                        acc[skey] = sketches.PeerStats()
+                    acc[skey].add_participant(p, m["duration_s"])
+                    touched.add(skey)
+        win = any(p.get("win", False) for p in team)
+        for skey in touched:
+            acc[skey].add_game(win)
+
+def flush_sketches(acc, retries=5):
+    """Merge this shard's sketches into the stored ones (optimistic, versioned)."""
+    for skey, stats in acc.items():
+        for _ in range(retries):
+            cur = ddb.get_item(
+                TableName=SKETCH_TABLE,
+                Key={"sketch_key": {"S": skey}},
+                ConsistentRead=True,
+            ).get("Item")
+            version = int(cur["version"]["N"]) if cur else 0
+            merged = sketches.PeerStats.from_bytes(cur["blob"]["B"]) if cur else sketches.PeerStats()
+            merged.merge(stats)
+            try:
+                ddb.put_item(
+                    TableName=SKETCH_TABLE,
+                    Item={
+                        "sketch_key": {"S": skey},
+                        "version":    {"N": str(version + 1)},
+                        "games":      {"N": str(merged.games)},
+                        "blob":       {"B": merged.to_bytes()},
+                    },
+                    ConditionExpression="attribute_not_exists(sketch_key) OR version = :v",
+                    ExpressionAttributeValues={":v": {"N": str(version)}},
+                )
+                break
+            except ddb.exceptions.ConditionalCheckFailedException:
+                continue  # another shard wrote first; re-read and merge again
+        else:
+            raise RuntimeError(f"sketch merge contention on {skey}")
+
+def mark_sketched(rows):
+    for m in rows:
+        ddb.update_item(
+            TableName=TABLE,
+            Key={
+                "lineup_key": {"S": lineup_key(m["teams"])},
+                "start_ms":   {"N": str(m["start_ms"])},
+            },
+            UpdateExpression="SET sketched = :t",
+            ExpressionAttributeValues={":t": {"BOOL": True}},
+        )
+
+def flush_batch(rows):
+    """Fold a batch of written rows into the sketch table, then mark them done."""
+    acc = {}
+    for m in rows:
+        add_to_sketches(acc, m)
+    flush_sketches(acc)
+    # a crash before this re-adds at most one batch on the next run
+    mark_sketched(rows)
+    return len(acc)
+
 def handler(event, _context):
     """
     event = {
       "bucket": "your-bucket",
       "key": "normalized/year.ndjson.gz"  # or .ndjson
     }
-    Each line: one normalized match JSON.
+    Each line: one normalized match JSON:
+      {"match_id", "queue_id", "start_ms", "duration_s",
+       "tier": "GOLD",   # optional; ladder tier of the lobby, feeds the per-tier sketches
+       "teams": [{"side", "role", "champ", "k", "d", "a", "cs", "gold", "win"}, ...]}
+    Rows without a tier only contribute to the ALL-tier sketches.
     """
     s3 = boto3.client("s3")
     bucket = event["bucket"]
@@ -63,10 +163,45 @@ def handler(event, _context):
     if key.endswith(".gz"):
         body = gzip.decompress(body)
 
+    pending = []  # rows whose sketch contribution is not flushed yet
+    flushed = skipped = 0
     for line in body.splitlines():
         if not line:
             continue
         m = json.loads(line)
-        ddb.put_item(TableName=TABLE, Item=to_ddb_item(m))
+        try:
+            lineup_key(m["teams"])
+        except lineups.LineupError:
+            skipped += 1  # unknown champion/side would alias another lineup
+            continue
+        try:
+            # row + rollup commit together; the row condition keeps re-runs of the
+            # same file from double-counting, and a crash can't leave one without the other
+            ddb.transact_write_items(
+                TransactItems=[
+                    {
+                        "Put": {
+                            "TableName": TABLE,
+                            "Item": to_ddb_item(m),
+                            "ConditionExpression": "attribute_not_exists(lineup_key)",
+                            "ReturnValuesOnConditionCheckFailure": "ALL_OLD",
+                        }
+                    },
+                    {"Update": rollup_update(m)},
+                ]
+            )
+        except ddb.exceptions.TransactionCanceledException as e:
+            existing = _existing_row(e)
+            if existing is None:
+                raise
+            if existing.get("sketched", {}).get("BOOL", True):
+                continue
+            # written by an earlier run that died before its sketch flush
+        pending.append(m)
+        if len(pending) >= SKETCH_BATCH:
+            flushed += flush_batch(pending)
+            pending = []
 
-    return {"ok": True}
+    if pending:
+        flushed += flush_batch(pending)
+    return {"ok": True, "sketches": flushed, "skipped": skipped}
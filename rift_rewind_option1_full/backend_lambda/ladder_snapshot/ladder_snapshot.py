@@ -0,0 +1,212 @@
+# ladder_snapshot/ladder_snapshot.py — periodic ladder snapshots for peer sampling
+#
+# Scheduled Lambda entrypoint: ladder_snapshot/ladder_snapshot.handler (zip root
+# backend_lambda/; EventBridge, e.g. every 6 hours). For each (platform, tier,
+# division) it reads a few league-exp pages, resolves every entry to a puuid
+# (league entries carry it directly; older payloads fall back to summoner-v4)
+# and stores the puuid plus its recent match IDs. handler._sample_peer_matches_same_lineup then samples from the
+# snapshot without any ladder or summoner calls.
+#
+# A full platform (31 tier/divisions) does not fit one 15 minute invocation, so
+# each run refreshes the stalest snapshots first and stops while it still has
+# time for one more division; successive runs rotate through every division,
+# apex tiers included.
+#
+# Item per snapshot in LADDER_TABLE:
+#   snapshot_key  "{platform}#{tier}#{division}"
+#   refreshed_at  epoch seconds
+#   players       number of players in the blob
+#   blob          zlib JSON {"players": [{"puuid": ..., "match_ids": [...]}]}
+import json
+import os
+import random
+import time
+import urllib.error
+import urllib.parse
+import zlib
+
+import boto3
+
+import riot_http
+
+RIOT_API_KEY = os.environ.get("RIOT_API_KEY", "")
+LADDER_TABLE = os.environ.get("LADDER_TABLE", "rr_ladder_snapshots")
+PAGES_PER_DIVISION = int(os.environ.get("LADDER_PAGES", "2"))
+PLAYERS_PER_SNAPSHOT = int(os.environ.get("LADDER_PLAYERS", "100"))
+MATCH_IDS_PER_PLAYER = int(os.environ.get("LADDER_MATCH_IDS", "10"))
+# a division is not started with less than this left (grows to the slowest one seen)
+DIVISION_BUDGET_S = float(os.environ.get("LADDER_DIVISION_BUDGET_S", "90"))
+STOP_MARGIN_S = 10.0  # kept for the last save_snapshot and the return
+RATE_LIMIT_RETRIES = int(os.environ.get("LADDER_429_RETRIES", "3"))
+# a new snapshot smaller than this fraction of the stored one is not written
+MIN_KEEP_RATIO = float(os.environ.get("LADDER_MIN_KEEP_RATIO", "0.5"))
+QUEUE_SOLO = "RANKED_SOLO_5x5"
+TIERS = ["IRON", "BRONZE", "SILVER", "GOLD", "PLATINUM", "EMERALD", "DIAMOND"]
+APEX_TIERS = ["MASTER", "GRANDMASTER", "CHALLENGER"]
+DIVISIONS = ["I", "II", "III", "IV"]
+ROUTING_BY_PLATFORM = {
+    "na1": "americas", "br1": "americas", "la1": "americas", "la2": "americas",
+    "euw1": "europe", "eun1": "europe", "tr1": "europe", "ru": "europe",
+    "kr": "asia", "jp1": "asia",
+    "oc1": "sea", "sg2": "sea", "tw2": "sea", "vn2": "sea",
+}
+
+ddb = boto3.client("dynamodb")
+
+
+class RateLimited(RuntimeError):
+    """429s outlasted the retries (or the deadline)."""
+
+
+def snapshot_key(platform, tier, division):
+    return f"{platform}#{tier}#{division}"
+
+
+def divisions_for(tier):
+    return ["I"] if tier in APEX_TIERS else DIVISIONS
+
+
+def _retry_after_s(exc):
+    try:
+        return max(0.0, float(exc.headers.get("Retry-After") or 1))
+    except (AttributeError, TypeError, ValueError):
+        return 1.0
+
+
+def _riot_get(url, deadline=None):
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        try:
+            return riot_http.get_json(url, headers={"X-Riot-Token": RIOT_API_KEY})
+        except urllib.error.HTTPError as e:
+            if e.code != 429:
+                raise
+            wait = _retry_after_s(e)
+            if attempt == RATE_LIMIT_RETRIES or (deadline is not None and time.monotonic() + wait > deadline):
+                raise RateLimited(url) from e
+            time.sleep(wait)
+
+
+def _entry_puuid(entry, platform, deadline=None):
+    if entry.get("puuid"):
+        return entry["puuid"]
+    summ = _riot_get(
+        f"https://{platform}.api.riotgames.com/lol/summoner/v4/"
+        f"summoners/{urllib.parse.quote(entry['summonerId'])}",
+        deadline,
+    )
+    return summ["puuid"]
+
+
+def build_snapshot(platform, tier, division, routing=None, deadline=None):
+    """Players for one division; stops early at deadline (time.monotonic())."""
+    routing = routing or ROUTING_BY_PLATFORM.get(platform, "americas")
+    base = f"https://{routing}.api.riotgames.com/lol/match/v5"
+    entries = []
+    for page in range(1, PAGES_PER_DIVISION + 1):
+        try:
+            entries.extend(
+                _riot_get(
+                    f"https://{platform}.api.riotgames.com/lol/league-exp/v4/"
+                    f"entries/{QUEUE_SOLO}/{tier}/{division}?page={page}",
+                    deadline,
+                )
+                or []
+            )
+        except Exception:
+            break  # past the last page, or rate limited; a short snapshot is not saved
+    random.shuffle(entries)
+
+    players = []
+    for e in entries:
+        if len(players) >= PLAYERS_PER_SNAPSHOT:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        try:
+            puuid = _entry_puuid(e, platform, deadline)
+            mids = _riot_get(
+                f"{base}/matches/by-puuid/{urllib.parse.quote(puuid)}/ids"
+                f"?queue=420&start=0&count={MATCH_IDS_PER_PLAYER}",
+                deadline,
+            )
+        except RateLimited:
+            break  # the key's quota is spent; more calls only extend the penalty
+        except Exception:
+            continue
+        players.append({"puuid": puuid, "match_ids": mids})
+        time.sleep(0.12)
+    return players
+
+
+def save_snapshot(platform, tier, division, players):
+    """False, and nothing written, when the stored snapshot is much larger."""
+    blob = zlib.compress(json.dumps({"players": players}, separators=(",", ":")).encode())
+    try:
+        ddb.put_item(
+            TableName=LADDER_TABLE,
+            Item={
+                "snapshot_key": {"S": snapshot_key(platform, tier, division)},
+                "refreshed_at": {"N": str(int(time.time()))},
+                "players":      {"N": str(len(players))},
+                "blob":         {"B": blob},
+            },
+            # a run cut short by 429s must not replace a full sample with a few players
+            ConditionExpression="attribute_not_exists(snapshot_key) OR players <= :most",
+            ExpressionAttributeValues={":most": {"N": str(int(len(players) / MIN_KEEP_RATIO))}},
+        )
+    except ddb.exceptions.ConditionalCheckFailedException:
+        return False
+    return True
+
+
+def load_snapshot(platform, tier, division, client=None):
+    """(refreshed_at, players) or None."""
+    item = (client or ddb).get_item(
+        TableName=LADDER_TABLE,
+        Key={"snapshot_key": {"S": snapshot_key(platform, tier, division)}},
+    ).get("Item")
+    if not item:
+        return None
+    players = json.loads(zlib.decompress(item["blob"]["B"]))["players"]
+    return int(item["refreshed_at"]["N"]), players
+
+
+def refreshed_at(platform, tier, division):
+    """Epoch seconds of the stored snapshot, 0 when there is none."""
+    item = ddb.get_item(
+        TableName=LADDER_TABLE,
+        Key={"snapshot_key": {"S": snapshot_key(platform, tier, division)}},
+        ProjectionExpression="refreshed_at",
+    ).get("Item")
+    return int(item["refreshed_at"]["N"]) if item else 0
+
+
+def handler(event, context):
+    """
+    event = {
+      "platform": "na1",                 # required
+      "tiers": ["GOLD", "PLATINUM"],     # optional, default: all tiers
+      "routing": "americas"              # optional, derived from platform
+    }
+    Divisions go stalest first; "remaining" lists the ones left for the next run.
+    """
+    platform = event["platform"]
+    tiers = event.get("tiers") or TIERS + APEX_TIERS
+    work = [(tier, div) for tier in tiers for div in divisions_for(tier)]
+    work.sort(key=lambda td: refreshed_at(platform, *td))  # stable: ties keep tier order
+
+    deadline = None
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000.0 - STOP_MARGIN_S
+    budget_s = DIVISION_BUDGET_S
+    done = []
+    for tier, div in work:
+        if deadline is not None and deadline - time.monotonic() < budget_s:
+            break
+        t0 = time.monotonic()
+        players = build_snapshot(platform, tier, div, routing=event.get("routing"), deadline=deadline)
+        saved = bool(players) and save_snapshot(platform, tier, div, players)
+        done.append({"tier": tier, "division": div, "players": len(players), "saved": saved})
+        budget_s = max(budget_s, time.monotonic() - t0)
+    remaining = [{"tier": tier, "division": div} for tier, div in work[len(done):]]
+    return {"ok": True, "snapshots": done, "remaining": remaining}
@@ -0,0 +1,299 @@
+# lineups.py — canonical compact lineup key shared by handler, api and index_builder
+#
+# A lineup is packed as 10 fixed 16-bit champion-ID slots:
+#   [BLUE TOP, JUNGLE, MIDDLE, BOTTOM, UTILITY][RED TOP, JUNGLE, MIDDLE, BOTTOM, UTILITY]
+# with an 8-bit variant header on top, so every key is a 168-bit int
+# (21 bytes / 42 hex chars). Empty slots are 0, which lets partial lineups
+# be encoded with the same layout.
+#
+# Variants (header bits):
+#   SIDE_AGNOSTIC  the two team halves are ordered by value, so swapping
+#                  BLUE/RED gives the same key
+#   ROLE_AGNOSTIC  each half holds its champion IDs sorted ascending instead
+#                  of by role slot
+# A team whose roles are missing or collide is always encoded role-agnostic.
+# Champions that cannot be resolved to an ID are rejected rather than packed
+# as empty slots, and so are seats without a side or a side with more than
+# five champions, so a bad payload can never alias a real lineup
+# (LineupError and its subclasses).
+import re
+
+SIDES = ("BLUE", "RED")
+ROLES = ("TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY")
+
+SLOT_BITS = 16
+TEAM_SLOTS = len(ROLES)
+TEAM_BITS = SLOT_BITS * TEAM_SLOTS
+LINEUP_BITS = TEAM_BITS * len(SIDES)
+KEY_BYTES = LINEUP_BITS // 8 + 1
+SLOT_MASK = (1 << SLOT_BITS) - 1
+TEAM_MASK = (1 << TEAM_BITS) - 1
+
+SIDE_AGNOSTIC = 0x01
+ROLE_AGNOSTIC = 0x02
+
+UNKNOWN_CHAMPION = -1
+
+
+class LineupError(ValueError):
+    """A lineup that cannot be packed without colliding with another one."""
+
+
+class UnknownChampionError(LineupError):
+    def __init__(self, champ):
+        super().__init__(f"unknown champion: {champ!r}")
+        self.champ = champ
+
+
+class InvalidLineupError(LineupError):
+    """Seat with a missing/unknown side, or more than TEAM_SLOTS seats on a side."""
+
+_SIDE_ALIASES = {
+    "BLUE": "BLUE",
+    "B": "BLUE",
+    "100": "BLUE",
+    "RED": "RED",
+    "R": "RED",
+    "200": "RED",
+}
+
+_ROLE_ALIASES = {
+    "TOP": "TOP",
+    "TOPLANE": "TOP",
+    "JUNGLE": "JUNGLE",
+    "JG": "JUNGLE",
+    "JUNG": "JUNGLE",
+    "MID": "MIDDLE",
+    "MIDDLE": "MIDDLE",
+    "MIDLANE": "MIDDLE",
+    "ADC": "BOTTOM",
+    "BOT": "BOTTOM",
+    "BOTTOM": "BOTTOM",
+    "CARRY": "BOTTOM",
+    "SUPPORT": "UTILITY",
+    "SUP": "UTILITY",
+    "SUPP": "UTILITY",
+    "UTILITY": "UTILITY",
+}
+
+# Riot championId by canonical champion name (Data Dragon ids/names with
+# everything but A-Z0-9 stripped).
+CHAMPION_IDS = {
+    "AATROX": 266, "AHRI": 103, "AKALI": 84, "AKSHAN": 166, "ALISTAR": 12,
+    "AMBESSA": 799, "AMUMU": 32, "ANIVIA": 34, "ANNIE": 1, "APHELIOS": 523,
+    "ASHE": 22, "AURELIONSOL": 136, "AURORA": 893, "AZIR": 268, "BARD": 432,
+    "BELVETH": 200, "BLITZCRANK": 53, "BRAND": 63, "BRAUM": 201, "BRIAR": 233,
+    "CAITLYN": 51, "CAMILLE": 164, "CASSIOPEIA": 69, "CHOGATH": 31,
+    "CORKI": 42, "DARIUS": 122, "DIANA": 131, "DRAVEN": 119, "DRMUNDO": 36,
+    "EKKO": 245, "ELISE": 60, "EVELYNN": 28, "EZREAL": 81,
+    "FIDDLESTICKS": 9, "FIORA": 114, "FIZZ": 105, "GALIO": 3,
+    "GANGPLANK": 41, "GAREN": 86, "GNAR": 150, "GRAGAS": 79, "GRAVES": 104,
+    "GWEN": 887, "HECARIM": 120, "HEIMERDINGER": 74, "HWEI": 910,
+    "ILLAOI": 420, "IRELIA": 39, "IVERN": 427, "JANNA": 40, "JARVANIV": 59,
+    "JAX": 24, "JAYCE": 126, "JHIN": 202, "JINX": 222, "KAISA": 145,
+    "KALISTA": 429, "KARMA": 43, "KARTHUS": 30, "KASSADIN": 38,
+    "KATARINA": 55, "KAYLE": 10, "KAYN": 141, "KENNEN": 85, "KHAZIX": 121,
+    "KINDRED": 203, "KLED": 240, "KOGMAW": 96, "KSANTE": 897, "LEBLANC": 7,
+    "LEESIN": 64, "LEONA": 89, "LILLIA": 876, "LISSANDRA": 127,
+    "LUCIAN": 236, "LULU": 117, "LUX": 99, "MALPHITE": 54, "MALZAHAR": 90,
+    "MAOKAI": 57, "MASTERYI": 11, "MEL": 800, "MILIO": 902,
+    "MISSFORTUNE": 21, "MONKEYKING": 62, "MORDEKAISER": 82, "MORGANA": 25,
+    "NAAFIRI": 950, "NAMI": 267, "NASUS": 75, "NAUTILUS": 111, "NEEKO": 518,
+    "NIDALEE": 76, "NILAH": 895, "NOCTURNE": 56, "NUNU": 20, "OLAF": 2,
+    "ORIANNA": 61, "ORNN": 516, "PANTHEON": 80, "POPPY": 78, "PYKE": 555,
+    "QIYANA": 246, "QUINN": 133, "RAKAN": 497, "RAMMUS": 33, "REKSAI": 421,
+    "RELL": 526, "RENATA": 888, "RENEKTON": 58, "RENGAR": 107, "RIVEN": 92,
+    "RUMBLE": 68, "RYZE": 13, "SAMIRA": 360, "SEJUANI": 113, "SENNA": 235,
+    "SERAPHINE": 147, "SETT": 875, "SHACO": 35, "SHEN": 98, "SHYVANA": 102,
+    "SINGED": 27, "SION": 14, "SIVIR": 15, "SKARNER": 72, "SMOLDER": 901,
+    "SONA": 37, "SORAKA": 16, "SWAIN": 50, "SYLAS": 517, "SYNDRA": 134,
+    "TAHMKENCH": 223, "TALIYAH": 163, "TALON": 91, "TARIC": 44, "TEEMO": 17,
+    "THRESH": 412, "TRISTANA": 18, "TRUNDLE": 48, "TRYNDAMERE": 23,
+    "TWISTEDFATE": 4, "TWITCH": 29, "UDYR": 77, "URGOT": 6, "VARUS": 110,
+    "VAYNE": 67, "VEIGAR": 45, "VELKOZ": 161, "VEX": 711, "VI": 254,
+    "VIEGO": 234, "VIKTOR": 112, "VLADIMIR": 8, "VOLIBEAR": 106,
+    "WARWICK": 19, "XAYAH": 498, "XERATH": 101, "XINZHAO": 5, "YASUO": 157,
+    "YONE": 777, "YORICK": 83, "YUNARA": 804, "YUUMI": 350, "ZAC": 154,
+    "ZED": 238, "ZERI": 221, "ZIGGS": 115, "ZILEAN": 26, "ZOE": 142,
+    "ZYRA": 143,
+}
+
+# display names that differ from the Data Dragon id
+_CHAMPION_ALIASES = {
+    "WUKONG": "MONKEYKING",
+    "NUNUWILLUMP": "NUNU",
+    "RENATAGLASC": "RENATA",
+    "GLASC": "RENATA",
+}
+
+_CHAMPION_NAMES = {cid: name for name, cid in CHAMPION_IDS.items()}
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9]")
+
+
+def canon_side(side):
+    return _SIDE_ALIASES.get(str(side or "").strip().upper())
+
+
+def canon_role(role):
+    return _ROLE_ALIASES.get(str(role or "").strip().upper().replace(" ", ""))
+
+
+def canon_champ(name):
+    c = _NON_ALNUM.sub("", str(name or "").upper())
+    return _CHAMPION_ALIASES.get(c, c)
+
+
+def champion_id(champ):
+    """Riot championId for an id or a display/Data Dragon name.
+
+    0 for an empty seat (None / "" / 0), UNKNOWN_CHAMPION for anything else
+    that does not resolve.
+    """
+    if isinstance(champ, int):
+        if champ == 0:
+            return 0
+        return champ if 0 < champ <= SLOT_MASK else UNKNOWN_CHAMPION
+    s = str(champ or "").strip()
+    if not s:
+        return 0
+    if s.isdigit():
+        return champion_id(int(s))
+    return CHAMPION_IDS.get(canon_champ(s), UNKNOWN_CHAMPION)
+
+
+def champion_name(cid):
+    return _CHAMPION_NAMES.get(cid, "")
+
+
+# ===== Seat extraction =====
+# A seat is a (side, role, champion_id) tuple; side/role may be None.
+# Both builders raise UnknownChampionError for a champion that does not resolve;
+# sides are validated when the seats are packed (lineup_key).
+def seats_from_match(match):
+    """Seats from a Riot match-v5 document."""
+    seats = []
+    for p in match.get("info", {}).get("participants", []):
+        cid = champion_id(p.get("championId") or 0) or champion_id(p.get("championName"))
+        if cid == UNKNOWN_CHAMPION:
+            raise UnknownChampionError(p.get("championName") or p.get("championId"))
+        seats.append(
+            (
+                canon_side(p.get("teamId")),
+                canon_role(p.get("teamPosition") or p.get("individualPosition")),
+                cid,
+            )
+        )
+    return seats
+
+
+def seats_from_teams(teams):
+    """Seats from normalized [{side, role, champ}] rows (index NDJSON, compareLineup payload)."""
+    seats = []
+    for t in teams or []:
+        champ = t.get("champ_id") or t.get("champ") or t.get("championName")
+        cid = champion_id(champ)
+        if cid == UNKNOWN_CHAMPION:
+            raise UnknownChampionError(champ)
+        seats.append((canon_side(t.get("side")), canon_role(t.get("role")), cid))
+    return seats
+
+
+# ===== Packing =====
+def _pack_team(seats, role_agnostic):
+    ids = [cid for _role, cid in seats if cid]
+    slots = None
+    if not role_agnostic:
+        slots = [0] * TEAM_SLOTS
+        for role, cid in seats:
+            if not cid:
+                continue
+            if role is None or slots[ROLES.index(role)]:
+                slots = None  # missing/duplicate role: fall back to sorted ids
+                break
+            slots[ROLES.index(role)] = cid
+    if slots is None:
+        role_agnostic = True
+        slots = (sorted(ids) + [0] * TEAM_SLOTS)[:TEAM_SLOTS]
+    packed = 0
+    for cid in slots:
+        packed = (packed << SLOT_BITS) | cid
+    return packed, role_agnostic
+
+
+def lineup_key(seats, side_agnostic=False, role_agnostic=False):
+    """Pack seats into a 168-bit int key (variant header + 10 champion slots).
+
+    Raises UnknownChampionError if a seat holds UNKNOWN_CHAMPION and
+    InvalidLineupError if a champion has no side or a side has more than
+    TEAM_SLOTS champions. Empty seats (champion 0) are ignored.
+    """
+    by_side = {side: [] for side in SIDES}
+    for side, role, cid in seats:
+        if cid == UNKNOWN_CHAMPION:
+            raise UnknownChampionError((side, role))
+        if not cid:
+            continue
+        if side not in by_side:
+            raise InvalidLineupError(f"seat without a known side: {(side, role, cid)!r}")
+        by_side[side].append((role, cid))
+    for side, team in by_side.items():
+        if len(team) > TEAM_SLOTS:
+            raise InvalidLineupError(f"{len(team)} champions on {side}")
+
+    blue, blue_ra = _pack_team(by_side["BLUE"], role_agnostic)
+    red, red_ra = _pack_team(by_side["RED"], role_agnostic)
+    if blue_ra != red_ra:
+        # keep both halves in the same layout so side-swaps stay comparable
+        blue, _ = _pack_team(by_side["BLUE"], True)
+        red, _ = _pack_team(by_side["RED"], True)
+    flags = ROLE_AGNOSTIC if (blue_ra or red_ra) else 0
+
+    if side_agnostic:
+        flags |= SIDE_AGNOSTIC
+        blue, red = min(blue, red), max(blue, red)
+    return (flags << LINEUP_BITS) | (blue << TEAM_BITS) | red
+
+
+def key_variants(seats):
+    """Exact, side-agnostic, role-agnostic and fully agnostic keys for one lineup."""
+    return {
+        "exact": lineup_key(seats),
+        "any_side": lineup_key(seats, side_agnostic=True),
+        "any_role": lineup_key(seats, role_agnostic=True),
+        "any": lineup_key(seats, side_agnostic=True, role_agnostic=True),
+    }
+
+
+def key_flags(key):
+    return key >> LINEUP_BITS
+
+
+def key_to_bytes(key):
+    return key.to_bytes(KEY_BYTES, "big")
+
+
+def key_from_bytes(raw):
+    return int.from_bytes(raw, "big")
+
+
+def key_to_hex(key):
+    # fixed width so keys sort and compare as plain strings (DynamoDB S keys)
+    return format(key, "0%dx" % (KEY_BYTES * 2))
+
+
+def key_from_hex(s):
+    return int(s, 16)
+
+
+def unpack_key(key):
+    """Inverse of lineup_key: {"BLUE": [ids by slot], "RED": [...], "flags": int}."""
+    teams = {}
+    for i, side in enumerate(SIDES):
+        half = (key >> (TEAM_BITS * (len(SIDES) - 1 - i))) & TEAM_MASK
+        teams[side] = [
+            (half >> (SLOT_BITS * (TEAM_SLOTS - 1 - j))) & SLOT_MASK
+            for j in range(TEAM_SLOTS)
+        ]
+    teams["flags"] = key_flags(key)
+    return teams
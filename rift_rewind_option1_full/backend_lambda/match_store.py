@@ -0,0 +1,338 @@
+# match_store.py — append-only, memory-mapped participant store for offline analytics
+#
+# Layout of a store directory:
+#   rows.bin           fixed-width participant rows (ROW_DTYPE), append-only;
+#                      the 10 rows of a match are always contiguous
+#   puuids.txt         string dictionary, puuid id = line number (0 = unknown)
+#   champions.txt      "champ_id<TAB>display name" as first seen (Riot championName
+#                      or the NDJSON champ), so overviews show the Riot path's names
+#   matches.txt        match ids, match index = line number
+#   match_lineups.bin  lineups.lineup_key bytes per match index, append-only
+#   match_offsets.u8   match index -> first row            (CSR, len = matches + 1)
+#   puuid_order.u4     row numbers sorted by puuid id
+#   puuid_offsets.u8   puuid id -> slice of puuid_order    (CSR, len = puuids + 1)
+#   lineup_keys.bin    match_lineups.bin sorted, with
+#   lineup_order.u4    the match index for each sorted key
+#
+# Champions are stored as Riot championIds (the lineups.CHAMPION_IDS
+# dictionary), so rows stay numeric. Index files are rebuilt by
+# build_indexes() after appends; everything is opened with numpy.memmap, so
+# column reads (rows["kills"], ...) and per-match slices are zero-copy views.
+# A player's or a lineup's rows are spread over many matches: puuid_rows and
+# lineup_rows gather just those rows into a new array (no full scan), and
+# lineup_row_slices gives the per-match views without copying.
+# Needs numpy; this is an offline tool and is not part of the Lambda bundle.
+import gzip
+import json
+import os
+
+import numpy as np
+
+import lineups
+
+ROW_DTYPE = np.dtype(
+    [
+        ("start_ms", "<u8"),
+        ("match_idx", "<u4"),
+        ("puuid_id", "<u4"),
+        ("gold", "<u4"),
+        ("champ_id", "<u2"),
+        ("kills", "<u2"),
+        ("deaths", "<u2"),
+        ("assists", "<u2"),
+        ("cs", "<u2"),
+        ("duration_s", "<u2"),
+        ("role", "u1"),  # 1 + index in lineups.ROLES, 0 = unknown
+        ("side", "u1"),  # index in lineups.SIDES
+        ("win", "u1"),
+        ("_pad", "u1"),
+    ]
+)
+KEY_DTYPE = np.dtype(("S", lineups.KEY_BYTES))
+
+
+def _row_from_riot(p, info):
+    return (
+        int(info.get("gameStartTimestamp") or info.get("gameCreation") or 0),
+        p.get("puuid", ""),
+        lineups.champion_id(p.get("championId") or p.get("championName")),
+        p.get("championName") or "",
+        lineups.canon_role(p.get("teamPosition") or p.get("individualPosition")),
+        lineups.canon_side(p.get("teamId")),
+        p.get("kills", 0),
+        p.get("deaths", 0),
+        p.get("assists", 0),
+        p.get("totalMinionsKilled", 0) + p.get("neutralMinionsKilled", 0),
+        p.get("goldEarned", 0),
+        p.get("win", False),
+        int(info.get("gameDuration", 0)),
+    )
+
+
+def _row_from_normalized(t, m):
+    return (
+        int(m.get("start_ms", 0)),
+        t.get("puuid", ""),
+        lineups.champion_id(t.get("champ_id") or t.get("champ")),
+        t.get("champ") if isinstance(t.get("champ"), str) and not t["champ"].isdigit() else "",
+        lineups.canon_role(t.get("role")),
+        lineups.canon_side(t.get("side")),
+        t.get("k", 0),
+        t.get("d", 0),
+        t.get("a", 0),
+        t.get("cs", 0),
+        t.get("gold", 0),
+        t.get("win", False),
+        int(m.get("duration_s", 0)),
+    )
+
+
+def _parse_match(m):
+    """(match_id, seats, raw rows) from a Riot match-v5 doc or an index_builder NDJSON row."""
+    if "info" in m:
+        info = m["info"]
+        mid = m.get("metadata", {}).get("matchId") or str(info.get("gameId", ""))
+        return mid, lineups.seats_from_match(m), [_row_from_riot(p, info) for p in info.get("participants", [])]
+    teams = m.get("teams", [])
+    return m["match_id"], lineups.seats_from_teams(teams), [_row_from_normalized(t, m) for t in teams]
+
+
+def _mmap(path, dtype):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+class MatchStore:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._puuids = self._read_lines("puuids.txt")
+        self._new_puuids = [] if self._puuids else [""]  # id 0 = unknown puuid
+        self._puuids = self._puuids or [""]
+        self._puuid_ids = {p: i for i, p in enumerate(self._puuids)}
+        self._matches = self._read_lines("matches.txt")
+        self._match_idx = {m: i for i, m in enumerate(self._matches)}
+        self._champ_names = dict(
+            (int(cid), name) for cid, name in (ln.split("\t", 1) for ln in self._read_lines("champions.txt"))
+        )
+        self._new_champ_names = []
+        self._pending = []  # (match_id, lineup key bytes, rows) not yet on disk
+        self._open()
+        if len(self.match_offsets) != len(self._matches) + 1:
+            self.build_indexes()
+
+    # ----- files -----
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _exists(self, name):
+        return os.path.exists(self._file(name))
+
+    def _read_lines(self, name):
+        if not self._exists(name):
+            return []
+        with open(self._file(name), encoding="utf-8") as f:
+            return f.read().split("\n")[:-1]
+
+    def _open(self):
+        self.rows = _mmap(self._file("rows.bin"), ROW_DTYPE)
+        self.match_offsets = _mmap(self._file("match_offsets.u8"), "<u8")
+        self.puuid_order = _mmap(self._file("puuid_order.u4"), "<u4")
+        self.puuid_offsets = _mmap(self._file("puuid_offsets.u8"), "<u8")
+        self.lineup_keys = _mmap(self._file("lineup_keys.bin"), KEY_DTYPE)
+        self.lineup_order = _mmap(self._file("lineup_order.u4"), "<u4")
+
+    # ----- writes -----
+    def _puuid_id(self, puuid):
+        pid = self._puuid_ids.get(puuid)
+        if pid is None:
+            pid = self._puuid_ids[puuid] = len(self._puuids)
+            self._puuids.append(puuid)
+            self._new_puuids.append(puuid)
+        return pid
+
+    def append_match(self, m):
+        """Queue one match (Riot doc or normalized row); False if already stored or unkeyable."""
+        try:
+            mid, seats, raw = _parse_match(m)
+            key = lineups.key_to_bytes(lineups.lineup_key(seats))
+        except lineups.LineupError:
+            return False  # would collide with another lineup; skip the match
+        if not mid or mid in self._match_idx or not raw:
+            return False
+        idx = self._match_idx[mid] = len(self._matches)
+        self._matches.append(mid)
+        rows = np.zeros(len(raw), dtype=ROW_DTYPE)
+        for i, (start_ms, puuid, champ, champ_name, role, side, k, d, a, cs, gold, win, dur) in enumerate(raw):
+            if champ_name and champ not in self._champ_names:
+                self._champ_names[champ] = champ_name
+                self._new_champ_names.append((champ, champ_name))
+            rows[i] = (
+                start_ms, idx, self._puuid_id(puuid), gold, champ, k, d, a, cs,
+                min(dur, 0xFFFF), lineups.ROLES.index(role) + 1 if role else 0,
+                lineups.SIDES.index(side) if side else 0, 1 if win else 0, 0,
+            )
+        self._pending.append((mid, key, rows))
+        return True
+
+    def flush(self):
+        """Append queued rows and dictionary entries, then rebuild the indexes."""
+        if not self._pending:
+            return 0
+        with open(self._file("rows.bin"), "ab") as f:
+            for _, _, rows in self._pending:
+                f.write(rows.tobytes())
+        with open(self._file("matches.txt"), "a", encoding="utf-8") as f:
+            f.writelines(mid + "\n" for mid, _, _ in self._pending)
+        with open(self._file("puuids.txt"), "a", encoding="utf-8") as f:
+            f.writelines(p + "\n" for p in self._new_puuids)
+        with open(self._file("champions.txt"), "a", encoding="utf-8") as f:
+            f.writelines(f"{cid}\t{name}\n" for cid, name in self._new_champ_names)
+        with open(self._file("match_lineups.bin"), "ab") as f:
+            for _, key, _ in self._pending:
+                f.write(key)
+        n = len(self._pending)
+        self._pending, self._new_puuids, self._new_champ_names = [], [], []
+        self.build_indexes()
+        return n
+
+    def ingest_ndjson(self, path):
+        opener = gzip.open if path.endswith(".gz") else open
+        added = 0
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip() and self.append_match(json.loads(line)):
+                    added += 1
+        self.flush()
+        return added
+
+    def build_indexes(self):
+        rows = _mmap(self._file("rows.bin"), ROW_DTYPE)
+        n_matches = len(self._matches)
+
+        counts = np.bincount(rows["match_idx"], minlength=n_matches) if len(rows) else np.zeros(n_matches, "<u8")
+        match_offsets = np.zeros(n_matches + 1, dtype="<u8")
+        np.cumsum(counts, out=match_offsets[1:])
+
+        pids = rows["puuid_id"]
+        puuid_order = np.argsort(pids, kind="stable").astype("<u4")
+        counts = np.bincount(pids, minlength=len(self._puuids)) if len(rows) else np.zeros(len(self._puuids), "<u8")
+        puuid_offsets = np.zeros(len(self._puuids) + 1, dtype="<u8")
+        np.cumsum(counts, out=puuid_offsets[1:])
+
+        keys = _mmap(self._file("match_lineups.bin"), KEY_DTYPE)
+        lineup_order = np.argsort(keys, kind="stable").astype("<u4")
+
+        for name, arr in (
+            ("match_offsets.u8", match_offsets),
+            ("puuid_order.u4", puuid_order),
+            ("puuid_offsets.u8", puuid_offsets),
+            ("lineup_keys.bin", np.asarray(keys)[lineup_order]),
+            ("lineup_order.u4", lineup_order),
+        ):
+            tmp = self._file(name + ".tmp")
+            arr.tofile(tmp)
+            os.replace(tmp, self._file(name))
+        self._open()
+
+    # ----- reads -----
+    def __len__(self):
+        return len(self._matches)
+
+    def match_rows(self, match_id):
+        idx = self._match_idx.get(match_id)
+        if idx is None or idx + 1 >= len(self.match_offsets):
+            return self.rows[:0]
+        return self.rows[int(self.match_offsets[idx]) : int(self.match_offsets[idx + 1])]
+
+    def puuid_row_ids(self, puuid):
+        pid = self._puuid_ids.get(puuid)
+        if not pid or pid + 1 >= len(self.puuid_offsets):
+            return np.zeros(0, dtype="<u4")
+        return self.puuid_order[int(self.puuid_offsets[pid]) : int(self.puuid_offsets[pid + 1])]
+
+    def puuid_rows(self, puuid):
+        # a player's rows are not contiguous: this gathers a copy of just those rows
+        return self.rows[self.puuid_row_ids(puuid)]
+
+    def lineup_match_idxs(self, lineup_key_hex):
+        key = lineups.key_to_bytes(lineups.key_from_hex(lineup_key_hex))
+        lo = np.searchsorted(self.lineup_keys, key, side="left")
+        hi = np.searchsorted(self.lineup_keys, key, side="right")
+        return self.lineup_order[lo:hi]
+
+    def lineup_row_slices(self, lineup_key_hex):
+        """One zero-copy view of rows per match with this lineup."""
+        off = self.match_offsets
+        return [self.rows[int(off[i]) : int(off[i + 1])] for i in self.lineup_match_idxs(lineup_key_hex)]
+
+    def lineup_rows(self, lineup_key_hex):
+        # row ranges straight from match_offsets, gathered into one array
+        idxs = self.lineup_match_idxs(lineup_key_hex).astype(np.int64)
+        if not len(idxs):
+            return self.rows[:0]
+        starts = self.match_offsets[idxs].astype(np.int64)
+        counts = self.match_offsets[idxs + 1].astype(np.int64) - starts
+        first = np.cumsum(counts) - counts
+        row_ids = np.repeat(starts - first, counts) + np.arange(int(counts.sum()))
+        return self.rows[row_ids]
+
+    # ----- aggregates -----
+    def player_overview(self, puuid, last_n=None):
+        """Same shape as handler._overview_from_matches' overview."""
+        r = self.puuid_rows(puuid)
+        if last_n:
+            r = r[np.argsort(r["start_ms"])[::-1][:last_n]]
+        games = len(r)
+        if games == 0:
+            return {"games_analyzed": 0}
+        kills, deaths, assists = (int(r[c].sum()) for c in ("kills", "deaths", "assists"))
+        wins = int(r["win"].sum())
+        minutes = float(r["duration_s"].sum()) / 60.0
+        # ties go to the champion seen first in newest-first order, like the Riot path
+        recent = r["champ_id"][np.argsort(r["start_ms"], kind="stable")[::-1]]
+        champs, first, counts = np.unique(recent, return_index=True, return_counts=True)
+        fav = int(champs[first == first[counts == counts.max()].min()][0])
+        return {
+            "games_analyzed": games,
+            "wins": wins,
+            "winrate": round(wins / float(games) * 100.0, 1),
+            "avg_kills": round(kills / float(games), 1),
+            "avg_deaths": round(deaths / float(games), 1),
+            "avg_assists": round(assists / float(games), 1),
+            "kda": round((kills + assists) / float(deaths) if deaths > 0 else float(kills + assists), 2),
+            "cs_per_min": round(int(r["cs"].sum()) / minutes if minutes > 0 else 0.0, 2),
+            "favorite_champion": self.champion_display_name(fav),
+        }
+
+    def champion_display_name(self, cid):
+        # first name seen on ingest; the lineups key is only a fallback (upper-case, no spaces)
+        return self._champ_names.get(cid) or lineups.champion_name(cid) or "Unknown"
+
+    @staticmethod
+    def peer_medians_of(r):
+        """Same shape as handler._aggregate_peer_medians, over participant rows."""
+        if len(r) == 0:
+            return {"kda": 0.0, "cs_per_min": 0.0, "gold": 0.0, "winrate": 0.0}
+        k, d, a = (r[c].astype(np.float64) for c in ("kills", "deaths", "assists"))
+        kda = np.where(d > 0, (k + a) / np.maximum(d, 1), k + a)
+        gm = np.maximum(1, r["duration_s"]).astype(np.float64) / 60.0
+        return {
+            "kda": float(np.median(kda)),
+            "cs_per_min": float(np.median(r["cs"] / gm)),
+            "gold": float(np.median(r["gold"])),
+            "winrate": float(np.median(r["win"])),
+        }
+
+    def peer_medians(self, lineup_key_hex):
+        return self.peer_medians_of(self.lineup_rows(lineup_key_hex))
+
+
+if __name__ == "__main__":
+    import sys
+
+    store = MatchStore(sys.argv[1])
+    for p in sys.argv[2:]:
+        print(p, store.ingest_ndjson(p))
+    print(json.dumps({"matches": len(store), "rows": int(len(store.rows))}))
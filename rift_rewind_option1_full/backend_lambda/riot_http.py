@@ -0,0 +1,298 @@
+# riot_http.py — Riot GETs with adaptive timeouts, hedging and a per-host circuit breaker
+#
+# - latency is tracked per (host, method, route) over a rolling window; once
+#   there are enough samples the socket timeout follows the observed p99
+#   instead of a fixed 8s. A timeout is recorded as a sample at the timeout
+#   it hit, so a route that slows down pushes its own timeout back up, and a
+#   timeout below the fixed 8s (our cap, not the host) doesn't trip the breaker
+# - idempotent GETs are hedged: if the first attempt is still running after
+#   min(p95, 3 x p50) of the route, a duplicate goes out and the first
+#   response wins; the loser is cancelled if it has not started, otherwise its
+#   result is dropped (urllib cannot abort a request mid-flight). Only the
+#   winner's latency is recorded, so stalled losers don't drag the hedge
+#   trigger up. Hedges are capped at a small fraction of traffic so they
+#   barely touch the rate-limit quota.
+# - a host that keeps returning 5xx / timing out is short-circuited for a
+#   cooldown, then probed with a single half-open request on the full 8s timeout
+import json
+import os
+import re
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_TIMEOUT_S = float(os.environ.get("RIOT_TIMEOUT_S", "8"))
+MIN_TIMEOUT_S = float(os.environ.get("RIOT_MIN_TIMEOUT_S", "1.5"))
+TIMEOUT_P99_FACTOR = 3.0
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+MIN_HEDGE_DELAY_S = 0.05
+# with a few percent of stalls p95 lands inside the stall tail; the p50
+# multiple keeps the trigger near the healthy latency
+HEDGE_P50_FACTOR = 3.0
+HEDGE_RATIO = float(os.environ.get("RIOT_HEDGE_RATIO", "0.05"))
+HEDGE_BURST = 3
+BREAKER_FAILURES = int(os.environ.get("RIOT_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_S = float(os.environ.get("RIOT_BREAKER_COOLDOWN_S", "10"))
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, host):
+        super().__init__(f"circuit open for {host}")
+        self.host = host
+
+
+_VERSION = re.compile(r"v\d+")
+# path params that follow a by-* selector (by-riot-id/{gameName}/{tagLine})
+_BY_PARAMS = {"by-riot-id": 2}
+
+
+def _is_id_segment(seg):
+    # Riot route words are short, lowercase letters (plus vN versions); match
+    # ids (NA1_123), puuids, summoner ids and queue/tier/division are not
+    if _VERSION.fullmatch(seg):
+        return False
+    return (
+        "_" in seg
+        or len(seg) > 24
+        or any(c.isupper() or c.isdigit() for c in seg)
+    )
+
+
+def endpoint_key(url, method="GET"):
+    """host + method + route template, e.g. /lol/match/v5/matches/by-puuid/{id}/ids."""
+    parts = urllib.parse.urlsplit(url)
+    route, params = [], 0
+    for seg in (s for s in parts.path.split("/") if s):
+        if params:
+            route.append("{id}")
+            params -= 1
+        elif seg.startswith("by-"):
+            route.append(seg)
+            params = _BY_PARAMS.get(seg, 1)
+        else:
+            route.append("{id}" if _is_id_segment(urllib.parse.unquote(seg)) else seg)
+    return (parts.netloc, method, "/" + "/".join(route))
+
+
+class LatencyTracker:
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds):
+        with self._lock:
+            if key not in self._samples:
+                self._samples[key] = deque(maxlen=self.window)
+            self._samples[key].append(seconds)
+
+    def quantile(self, key, q):
+        with self._lock:
+            vals = sorted(self._samples.get(key, ()))
+        if len(vals) < MIN_SAMPLES:
+            return None
+        return vals[min(len(vals) - 1, int(q * len(vals)))]
+
+    def timeout_for(self, key):
+        p99 = self.quantile(key, 0.99)
+        if p99 is None:
+            return DEFAULT_TIMEOUT_S
+        return max(MIN_TIMEOUT_S, min(DEFAULT_TIMEOUT_S, p99 * TIMEOUT_P99_FACTOR))
+
+    def hedge_delay_for(self, key):
+        p95 = self.quantile(key, 0.95)
+        if p95 is None:
+            return None
+        p50 = self.quantile(key, 0.5)
+        return max(MIN_HEDGE_DELAY_S, min(p95, HEDGE_P50_FACTOR * p50))
+
+    def snapshot(self):
+        with self._lock:
+            keys = list(self._samples)
+        return {
+            " ".join(k): {
+                "p50": self.quantile(k, 0.5),
+                "p95": self.quantile(k, 0.95),
+                "p99": self.quantile(k, 0.99),
+            }
+            for k in keys
+        }
+
+
+class CircuitBreaker:
+    def __init__(self, failures=BREAKER_FAILURES, cooldown_s=BREAKER_COOLDOWN_S):
+        self.failures = failures
+        self.cooldown_s = cooldown_s
+        self._state = {}  # host -> [consecutive failures, opened_at or None, probing]
+        self._lock = threading.Lock()
+
+    def before(self, host):
+        """True when this call is the half-open probe; raises while open."""
+        with self._lock:
+            st = self._state.setdefault(host, [0, None, False])
+            if st[1] is None:
+                return False
+            if time.monotonic() - st[1] < self.cooldown_s or st[2]:
+                raise CircuitOpenError(host)
+            st[2] = True  # half-open: let one probe through
+            return True
+
+    def success(self, host):
+        with self._lock:
+            self._state[host] = [0, None, False]
+
+    def failure(self, host):
+        with self._lock:
+            st = self._state.setdefault(host, [0, None, False])
+            st[0] += 1
+            st[2] = False
+            if st[0] >= self.failures:
+                st[1] = time.monotonic()
+
+
+latency = LatencyTracker()
+breaker = CircuitBreaker()
+_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("RIOT_HTTP_WORKERS", "16")))
+_counts = {"requests": 0, "hedges": 0}
+_counts_lock = threading.Lock()
+
+
+def _is_timeout(exc):
+    if isinstance(exc, urllib.error.URLError) and not isinstance(exc, urllib.error.HTTPError):
+        exc = exc.reason
+    return isinstance(exc, (socket.timeout, TimeoutError))
+
+
+def _is_server_failure(exc):
+    if isinstance(exc, urllib.error.HTTPError):
+        return exc.code >= 500
+    return isinstance(exc, (urllib.error.URLError, socket.timeout, TimeoutError))
+
+
+def _fetch(url, headers, timeout):
+    req = urllib.request.Request(url, headers=headers)
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+
+def _attempt(url, headers, key):
+    """(data, seconds); the caller records latency for the attempt it uses."""
+    host = key[0]
+    probe = breaker.before(host)
+    # the probe decides whether the host is back, so it gets the full timeout
+    timeout = DEFAULT_TIMEOUT_S if probe else latency.timeout_for(key)
+    t0 = time.monotonic()
+    try:
+        data = _fetch(url, headers, timeout)
+    except Exception as e:
+        if _is_timeout(e):
+            latency.record(key, timeout)  # lets the adaptive timeout grow again
+            if timeout < DEFAULT_TIMEOUT_S:
+                raise  # hit our own cap, not evidence the host is down
+        if _is_server_failure(e):
+            breaker.failure(host)
+        else:
+            breaker.success(host)  # 4xx/429 means the host is up
+        raise
+    breaker.success(host)
+    return data, time.monotonic() - t0
+
+
+def _winner(key, fut):
+    data, seconds = fut.result()
+    latency.record(key, seconds)
+    return data
+
+
+def _take_hedge_token():
+    with _counts_lock:
+        if _counts["hedges"] >= HEDGE_RATIO * _counts["requests"] + HEDGE_BURST:
+            return False
+        _counts["hedges"] += 1
+        return True
+
+
+def get_json(url, headers=None, hedge=True):
+    """GET url and decode JSON; hedged when the route has enough latency history."""
+    headers = headers or {}
+    key = endpoint_key(url)
+    with _counts_lock:
+        _counts["requests"] += 1
+
+    delay = latency.hedge_delay_for(key) if hedge else None
+    if delay is None:
+        data, seconds = _attempt(url, headers, key)
+        latency.record(key, seconds)
+        return data
+
+    first = _pool.submit(_attempt, url, headers, key)
+    done, _ = wait([first], timeout=delay)
+    if done or not _take_hedge_token():
+        return _winner(key, first)
+
+    second = _pool.submit(_attempt, url, headers, key)
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            if fut.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return _winner(key, fut)
+            if error is None or fut is first:
+                error = fut.exception()
+    raise error
+
+
+def stats():
+    with _counts_lock:
+        counts = dict(_counts)
+    return {"counts": counts, "latency": latency.snapshot()}
+
+
+def _bench(argv):
+    import argparse
+
+    ap = argparse.ArgumentParser(description="hedged vs plain GET latency against a Riot stand-in")
+    ap.add_argument("--url", required=True)
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--workers", type=int, default=4)
+    args = ap.parse_args(argv)
+
+    global latency, breaker
+    for hedge in (False, True):
+        latency, breaker = LatencyTracker(), CircuitBreaker()
+        with _counts_lock:
+            _counts.update(requests=0, hedges=0)
+        took, errors = [], []
+
+        def one(_):
+            t0 = time.monotonic()
+            try:
+                get_json(args.url, hedge=hedge)
+            except Exception as e:
+                errors.append(type(e).__name__)
+            took.append(time.monotonic() - t0)
+
+        with ThreadPoolExecutor(max_workers=args.workers) as ex:
+            list(ex.map(one, range(args.requests)))
+        took.sort()
+
+        def q(p):
+            return round(took[min(len(took) - 1, int(p * len(took)))] * 1000.0, 1)
+
+        print(json.dumps({"hedge": hedge, "p50_ms": q(0.5), "p99_ms": q(0.99), "p999_ms": q(0.999),
+                          "errors": len(errors), **_counts}))
+
+
+if __name__ == "__main__":
+    import sys
+
+    _bench(sys.argv[1:])
@@ -0,0 +1,131 @@
+# riot_standin.py — local Riot API stand-in for benchmarks
+#
+# Serves just the match-v5 routes the watcher and riot_http use:
+#   GET /lol/match/v5/matches/by-puuid/{puuid}/ids?start=&count=
+#   GET /lol/match/v5/matches/{matchId}
+# Every puuid "plays" a new game every --game-every-s seconds (offset per
+# puuid), so pollers see fresh match IDs over time. Responses take
+# --latency-ms (+-30% jitter); a --stall-ratio fraction stalls for --stall-s.
+#
+#   python riot_standin.py --port 8080 --stall-ratio 0.05 --stall-s 2
+#   python -m watcher.watcher --base-url http://127.0.0.1:8080 --players 2000 --seconds 30
+#   python riot_http.py --url http://127.0.0.1:8080/lol/match/v5/matches/NA1_1
+#
+# Not part of the Lambda bundle.
+import json
+import random
+import sys
+import threading
+import time
+import urllib.parse
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandIn:
+    def __init__(self, latency_ms=10.0, stall_ratio=0.0, stall_s=2.0, game_every_s=60.0, seed=None):
+        self.latency_s = latency_ms / 1000.0
+        self.stall_ratio = stall_ratio
+        self.stall_s = stall_s
+        self.game_every_s = game_every_s
+        self.started = time.time()
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self):
+        with self._lock:
+            self.requests += 1
+            if self._rng.random() < self.stall_ratio:
+                return self.stall_s
+            return self.latency_s * self._rng.uniform(0.7, 1.3)
+
+    def games_played(self, puuid):
+        offset = (zlib.crc32(puuid.encode()) % 1000) / 1000.0
+        return int((time.time() - self.started) / self.game_every_s + offset)
+
+    def match_ids(self, puuid, start=0, count=20):
+        n = self.games_played(puuid)
+        tag = zlib.crc32(puuid.encode())
+        return [f"NA1_{tag}{i:05d}" for i in range(n - 1 - start, max(-1, n - 1 - start - count), -1)]
+
+    def match(self, match_id):
+        return {
+            "metadata": {"matchId": match_id},
+            "info": {"gameDuration": 1800, "participants": []},
+        }
+
+    def route(self, path, query):
+        segs = [urllib.parse.unquote(s) for s in path.split("/") if s]
+        if segs[:4] != ["lol", "match", "v5", "matches"]:
+            return 404, {"status": {"status_code": 404}}
+        rest = segs[4:]
+        if len(rest) == 3 and rest[0] == "by-puuid" and rest[2] == "ids":
+            start = int(query.get("start", ["0"])[0])
+            count = int(query.get("count", ["20"])[0])
+            return 200, self.match_ids(rest[1], start, count)
+        if len(rest) == 1:
+            return 200, self.match(rest[0])
+        return 404, {"status": {"status_code": 404}}
+
+    def handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urllib.parse.urlsplit(self.path)
+                time.sleep(standin._delay())
+                status, body = standin.route(parts.path, urllib.parse.parse_qs(parts.query))
+                raw = json.dumps(body).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(raw)))
+                    self.end_headers()
+                    self.wfile.write(raw)
+                except OSError:
+                    pass  # client gave up (timeout / hedge loser)
+
+            def log_message(self, *_args):
+                pass
+
+        return Handler
+
+
+def serve(port=0, **kwargs):
+    """Start a stand-in on a daemon thread; returns (server, standin). port 0 = any free port."""
+    standin = StandIn(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), standin.handler_class())
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, standin
+
+
+def main(argv):
+    import argparse
+
+    ap = argparse.ArgumentParser(description="local Riot API stand-in")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--latency-ms", type=float, default=10.0)
+    ap.add_argument("--stall-ratio", type=float, default=0.0)
+    ap.add_argument("--stall-s", type=float, default=2.0)
+    ap.add_argument("--game-every-s", type=float, default=60.0)
+    args = ap.parse_args(argv)
+
+    server, _ = serve(
+        args.port,
+        latency_ms=args.latency_ms,
+        stall_ratio=args.stall_ratio,
+        stall_s=args.stall_s,
+        game_every_s=args.game_every_s,
+    )
+    print(f"riot stand-in on http://127.0.0.1:{server.server_port}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
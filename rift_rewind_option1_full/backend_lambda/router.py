@@ -16,8 +16,9 @@ def router(event, context):
         except Exception:
             action = action
 
-    if action == "comparelineup":
-        # event['body'] must contain JSON with { current_match: {...} }
+    if action in ("comparelineup", "comparelineups"):
+        # comparelineup: body JSON { current_match: {...} } or { teams: [...] }
+        # comparelineups: body JSON { lineups: [[...], ...] } (all-time rollups only)
         return compare_lineup(event, context)
 
     return {
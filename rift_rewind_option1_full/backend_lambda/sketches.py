@@ -0,0 +1,219 @@
+# sketches.py — mergeable quantile sketches for pre-aggregated peer stats
+#
+# KLL sketch (Karnin, Lang, Liberty 2016): a stack of compactors where level h
+# items weigh 2**h. When a level fills up it is sorted and every other item
+# (random offset) is promoted, so memory stays ~k / (1 - c) items no matter how
+# many values are added, and two sketches merge by concatenating levels.
+# Rank error is roughly 1.7 / k; k=128 keeps medians within ~1.5% rank.
+import json
+import math
+import random
+import zlib
+
+DEFAULT_K = 128
+_C = 2.0 / 3.0
+
+
+class KLL:
+    def __init__(self, k=DEFAULT_K, seed=None):
+        self.k = int(k)
+        self.n = 0
+        self.min = None
+        self.max = None
+        self.levels = [[]]
+        self._rng = random.Random(seed)
+        self._max_size = self._capacity(0)
+
+    def _capacity(self, h):
+        depth = len(self.levels) - h - 1
+        return max(2, int(math.ceil(self.k * (_C ** depth))))
+
+    def _grow(self):
+        self.levels.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def _size(self):
+        return sum(len(lvl) for lvl in self.levels)
+
+    def _compress(self):
+        while self._size() >= self._max_size:
+            for h in range(len(self.levels)):
+                lvl = self.levels[h]
+                if len(lvl) < self._capacity(h):
+                    continue
+                if h + 1 >= len(self.levels):
+                    self._grow()
+                lvl.sort()
+                keep = [lvl.pop()] if len(lvl) % 2 else []
+                offset = self._rng.random() < 0.5
+                self.levels[h + 1].extend(lvl[offset::2])
+                self.levels[h] = keep
+                break
+
+    def add(self, x):
+        x = float(x)
+        self.n += 1
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+        self.levels[0].append(x)
+        if self._size() >= self._max_size:
+            self._compress()
+
+    def merge(self, other):
+        if other.n == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self._grow()
+        for h, lvl in enumerate(other.levels):
+            self.levels[h].extend(lvl)
+        self.n += other.n
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self):
+        items = []
+        for h, lvl in enumerate(self.levels):
+            w = 1 << h
+            items.extend((x, w) for x in lvl)
+        items.sort()
+        return items
+
+    def quantiles(self, qs):
+        if self.n == 0:
+            return [0.0 for _ in qs]
+        items = self._weighted()
+        total = float(sum(w for _, w in items))
+        out = []
+        for q in qs:
+            if q <= 0:
+                out.append(self.min)
+                continue
+            if q >= 1:
+                out.append(self.max)
+                continue
+            target = q * total
+            acc = 0.0
+            val = items[-1][0]
+            for x, w in items:
+                acc += w
+                if acc >= target:
+                    val = x
+                    break
+            out.append(val)
+        return out
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+    def rank(self, x):
+        """Estimated fraction of added values <= x."""
+        if self.n == 0:
+            return 0.0
+        items = self._weighted()
+        total = float(sum(w for _, w in items))
+        return sum(w for v, w in items if v <= x) / total
+
+    def to_dict(self):
+        return {
+            "k": self.k,
+            "n": self.n,
+            "min": self.min,
+            "max": self.max,
+            "levels": [[round(x, 4) for x in lvl] for lvl in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        s = cls(k=d.get("k", DEFAULT_K))
+        s.n = int(d.get("n", 0))
+        s.min = d.get("min")
+        s.max = d.get("max")
+        s.levels = [list(lvl) for lvl in d.get("levels") or [[]]]
+        s._max_size = sum(s._capacity(h) for h in range(len(s.levels)))
+        return s
+
+
+# ===== Peer stats bundle =====
+PEER_METRICS = ("kda", "cs_per_min", "gold")
+PEER_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+class PeerStats:
+    """KDA / CS-per-min / gold sketches plus exact game and win counts.
+
+    Sketches take one value per participant; games/wins count matches, once
+    per match however many of its participants were added (add_game).
+    """
+
+    def __init__(self, k=DEFAULT_K):
+        self.sketches = {m: KLL(k) for m in PEER_METRICS}
+        self.games = 0
+        self.wins = 0
+
+    @property
+    def samples(self):
+        return self.sketches["kda"].n
+
+    def add(self, kda, cs_per_min, gold):
+        self.sketches["kda"].add(kda)
+        self.sketches["cs_per_min"].add(cs_per_min)
+        self.sketches["gold"].add(gold)
+
+    def add_participant(self, p, duration_s):
+        k, d, a = p.get("k", 0), p.get("d", 0), p.get("a", 0)
+        gm = max(1, duration_s) / 60.0
+        self.add(
+            (k + a) / float(d) if d > 0 else float(k + a),
+            p.get("cs", 0) / gm,
+            p.get("gold", 0),
+        )
+
+    def add_game(self, win):
+        self.games += 1
+        self.wins += 1 if win else 0
+
+    def merge(self, other):
+        for m in PEER_METRICS:
+            self.sketches[m].merge(other.sketches[m])
+        self.games += other.games
+        self.wins += other.wins
+        return self
+
+    def medians(self):
+        # same shape as handler._aggregate_peer_medians; winrate is wins/games
+        out = {m: float(self.sketches[m].quantile(0.5)) for m in PEER_METRICS}
+        out["winrate"] = self.wins / float(self.games) if self.games else 0.0
+        return out
+
+    def percentiles(self, qs=PEER_QUANTILES):
+        return {
+            m: {f"p{int(q * 100)}": round(v, 2) for q, v in zip(qs, self.sketches[m].quantiles(qs))}
+            for m in PEER_METRICS
+        }
+
+    def to_bytes(self):
+        d = {
+            "games": self.games,
+            "wins": self.wins,
+            "sketches": {m: s.to_dict() for m, s in self.sketches.items()},
+        }
+        return zlib.compress(json.dumps(d, separators=(",", ":")).encode())
+
+    @classmethod
+    def from_bytes(cls, raw):
+        d = json.loads(zlib.decompress(raw))
+        s = cls()
+        s.games = int(d.get("games", 0))
+        s.wins = int(d.get("wins", 0))
+        for m in PEER_METRICS:
+            if m in d.get("sketches", {}):
+                s.sketches[m] = KLL.from_dict(d["sketches"][m])
+        return s
+
+
+def sketch_key(lineup_key_hex, side, tier="ALL", role="ALL"):
+    # one sketch per side: a side's players share a result, so wins/games is
+    # that side's win rate (mixing both sides would always give 0.5)
+    return f"{lineup_key_hex}#{side}#{tier or 'ALL'}#{role or 'ALL'}"
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# backend_lambda modules are imported top-level, as in the Lambda bundle
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,54 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("boto3")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import handler
+
+
+@pytest.fixture
+def snapshot(monkeypatch):
+    stored = {}
+    monkeypatch.setattr(handler, "_ladder_cache", {})
+    monkeypatch.setattr(handler.ladder_snapshot, "load_snapshot", lambda p, t, d, client=None: stored.get((p, t, d)))
+    return stored
+
+
+def test_fresh_snapshot_is_used(snapshot):
+    snapshot[("na1", "GOLD", "I")] = (int(time.time()) - 3600, [{"puuid": "a", "match_ids": ["NA1_1"]}])
+    assert handler._ladder_players("na1", "GOLD", "I") == [{"puuid": "a", "match_ids": ["NA1_1"]}]
+
+
+def test_stale_snapshot_falls_back_to_the_live_crawl(snapshot):
+    old = int(time.time()) - handler.LADDER_SNAPSHOT_MAX_AGE_S - 1
+    snapshot[("na1", "GOLD", "I")] = (old, [{"puuid": "a", "match_ids": ["NA1_1"]}])
+    assert handler._ladder_players("na1", "GOLD", "I") == []
+    # no usable match IDs, so the caller crawls the ladder
+    assert handler._sample_from_snapshot("sig", "americas", "na1", "GOLD", 10) is None
+
+
+def _row(kda, cs, gold, win):
+    return {
+        "deltas": {"kda": kda, "cs_per_min": cs, "gold": gold, "win": win},
+        "peer_medians": {"kda": 2.5, "cs_per_min": 6.0, "gold": 10000.0, "winrate": 0.5},
+    }
+
+
+def test_coach_ranks_deltas_relative_to_peer_medians():
+    # -300 gold is 3% of the median; -1.0 KDA is 40% and must lead
+    text = handler._rule_based_coach({"target_tier": "GOLD"}, deltas_block=[_row(-1.0, -0.6, -300.0, 0.0)])
+    weak = next(line for line in text.splitlines() if line.startswith("Weaknesses:"))
+    assert weak.index("KDA") < weak.index("CS/min") < weak.index("gold")
+    focus = text.split("Focus on:\n", 1)[1].splitlines()
+    assert focus[0] == "- " + handler._DELTA_HABITS["kda"]
+
+
+def test_coach_keeps_most_played_out_of_strengths():
+    overview = {"games_analyzed": 20, "kda": 3.5, "avg_deaths": 3.0, "cs_per_min": 8.0,
+                "winrate": 60.0, "favorite_champion": "Ahri"}
+    lines = handler._rule_based_coach(overview, lane_hint="MIDDLE").splitlines()
+    assert "Most played: Ahri." in lines
+    assert not any("Most played" in line for line in lines if line.startswith("Strengths:"))
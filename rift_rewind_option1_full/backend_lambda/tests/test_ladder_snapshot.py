@@ -0,0 +1,137 @@
+import io
+import types
+import urllib.error
+
+import pytest
+
+pytest.importorskip("boto3")
+
+from ladder_snapshot import ladder_snapshot as ls
+
+
+class ConditionalCheckFailedException(Exception):
+    pass
+
+
+class FakeDdb:
+    exceptions = types.SimpleNamespace(ConditionalCheckFailedException=ConditionalCheckFailedException)
+
+    def __init__(self, refreshed=None, players=None):
+        self.refreshed = dict(refreshed or {})
+        self.players = dict(players or {})
+        self.puts = []
+
+    def get_item(self, TableName, Key, **_kw):
+        at = self.refreshed.get(Key["snapshot_key"]["S"])
+        return {"Item": {"refreshed_at": {"N": str(at)}}} if at is not None else {}
+
+    def put_item(self, TableName, Item, ConditionExpression=None, ExpressionAttributeValues=None):
+        key = Item["snapshot_key"]["S"]
+        if key in self.players and self.players[key] > int(ExpressionAttributeValues[":most"]["N"]):
+            raise ConditionalCheckFailedException()
+        self.players[key] = int(Item["players"]["N"])
+        self.puts.append(key)
+
+
+class Context:
+    def __init__(self, clock, ms):
+        self.clock, self.end = clock, clock.now + ms / 1000.0
+
+    def get_remaining_time_in_millis(self):
+        return int((self.end - self.clock.now) * 1000)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def env(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ls.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(ls.time, "sleep", lambda s: None)
+
+    def build(platform, tier, division, routing=None, deadline=None):
+        clock.now += 60.0  # one division takes a minute
+        return [{"puuid": f"{tier}{division}", "match_ids": []}]
+
+    monkeypatch.setattr(ls, "build_snapshot", build)
+    return clock
+
+
+def test_stops_before_the_deadline_and_reports_the_rest(env, monkeypatch):
+    ddb = FakeDdb()
+    monkeypatch.setattr(ls, "ddb", ddb)
+    out = ls.handler({"platform": "na1"}, Context(env, 900_000))
+    n = len(out["snapshots"])
+    assert 0 < n < 31
+    assert n + len(out["remaining"]) == 31
+    assert env.now <= 1000.0 + 900.0 - ls.STOP_MARGIN_S
+
+
+def test_stalest_divisions_go_first(env, monkeypatch):
+    # everything refreshed recently except the apex tiers, which were never stored
+    fresh = {
+        ls.snapshot_key("na1", t, d): 500 + i
+        for i, t in enumerate(ls.TIERS)
+        for d in ls.DIVISIONS
+    }
+    ddb = FakeDdb(fresh)
+    monkeypatch.setattr(ls, "ddb", ddb)
+    out = ls.handler({"platform": "na1"}, Context(env, 300_000))
+    assert [s["tier"] for s in out["snapshots"][:3]] == ls.APEX_TIERS
+    assert ddb.puts[0] == "na1#MASTER#I"
+
+
+def test_no_context_runs_everything(env, monkeypatch):
+    monkeypatch.setattr(ls, "ddb", FakeDdb())
+    out = ls.handler({"platform": "na1", "tiers": ["GOLD", "MASTER"]}, None)
+    assert len(out["snapshots"]) == 5 and out["remaining"] == []
+
+
+def test_small_snapshot_does_not_replace_a_full_one(monkeypatch):
+    ddb = FakeDdb(players={"na1#GOLD#I": 100})
+    monkeypatch.setattr(ls, "ddb", ddb)
+    assert not ls.save_snapshot("na1", "GOLD", "I", [{"puuid": "p"}] * 10)
+    assert ddb.players["na1#GOLD#I"] == 100
+    assert ls.save_snapshot("na1", "GOLD", "I", [{"puuid": "p"}] * 60)
+    assert ls.save_snapshot("na1", "SILVER", "I", [{"puuid": "p"}])  # nothing stored yet
+
+
+def _http_429(retry_after):
+    return urllib.error.HTTPError("u", 429, "rate limited", {"Retry-After": retry_after}, io.BytesIO())
+
+
+def test_429_waits_for_retry_after(monkeypatch):
+    calls, slept = [], []
+
+    def get_json(url, headers=None):
+        calls.append(url)
+        if len(calls) < 3:
+            raise _http_429("2")
+        return ["ok"]
+
+    monkeypatch.setattr(ls.riot_http, "get_json", get_json)
+    monkeypatch.setattr(ls.time, "sleep", slept.append)
+    assert ls._riot_get("u") == ["ok"]
+    assert slept == [2.0, 2.0]
+
+
+def test_429_past_the_deadline_stops_the_division(monkeypatch):
+    match_calls = []
+
+    def get_json(url, headers=None):
+        if "league-exp" in url:
+            return [{"puuid": f"p{i}"} for i in range(5)] if url.endswith("page=1") else []
+        match_calls.append(url)
+        raise _http_429("30")
+
+    monkeypatch.setattr(ls.riot_http, "get_json", get_json)
+    monkeypatch.setattr(ls.time, "sleep", lambda s: None)
+    monkeypatch.setattr(ls.time, "monotonic", lambda: 0.0)
+    assert ls.build_snapshot("na1", "GOLD", "I", deadline=10.0) == []
+    assert len(match_calls) == 1  # no retry past the deadline, no further players
@@ -0,0 +1,98 @@
+import pytest
+
+import lineups
+
+BLUE = ["Garen", "Lee Sin", "Ahri", "Jinx", "Thresh"]
+RED = ["Darius", "Vi", "Zed", "Kai'Sa", "Lulu"]
+
+
+def _teams(blue=BLUE, red=RED, roles=lineups.ROLES):
+    return [
+        {"side": side, "role": role, "champ": champ}
+        for side, champs in (("BLUE", blue), ("RED", red))
+        for role, champ in zip(roles, champs)
+    ]
+
+
+def _seats(teams):
+    return lineups.seats_from_teams(teams)
+
+
+def _swap(teams):
+    flip = {"BLUE": "RED", "RED": "BLUE"}
+    return [dict(t, side=flip[t["side"]]) for t in teams]
+
+
+def test_pack_unpack_round_trip():
+    key = lineups.lineup_key(_seats(_teams()))
+    teams = lineups.unpack_key(key)
+    assert teams["flags"] == 0
+    assert teams["BLUE"] == [lineups.champion_id(c) for c in BLUE]
+    assert teams["RED"] == [lineups.champion_id(c) for c in RED]
+    assert lineups.key_from_bytes(lineups.key_to_bytes(key)) == key
+    assert lineups.key_from_hex(lineups.key_to_hex(key)) == key
+
+
+def test_partial_lineup_round_trip():
+    key = lineups.lineup_key(_seats([{"side": "RED", "role": "UTILITY", "champ": "Lulu"}]))
+    teams = lineups.unpack_key(key)
+    assert teams["BLUE"] == [0] * lineups.TEAM_SLOTS
+    assert teams["RED"] == [0, 0, 0, 0, lineups.champion_id("Lulu")]
+
+
+def test_side_agnostic_matches_swapped_sides():
+    seats, swapped = _seats(_teams()), _seats(_swap(_teams()))
+    assert lineups.lineup_key(seats) != lineups.lineup_key(swapped)
+    assert lineups.lineup_key(seats, side_agnostic=True) == lineups.lineup_key(swapped, side_agnostic=True)
+    assert lineups.key_flags(lineups.lineup_key(seats, side_agnostic=True)) == lineups.SIDE_AGNOSTIC
+
+
+@pytest.mark.parametrize(
+    "roles",
+    [
+        ("TOP", "JUNGLE", None, "BOTTOM", "UTILITY"),
+        ("TOP", "JUNGLE", "TOP", "BOTTOM", "UTILITY"),
+    ],
+    ids=["missing", "duplicate"],
+)
+def test_role_agnostic_fallback(roles):
+    teams = _teams()
+    for t, role in zip(teams[:5], roles):
+        t["role"] = role
+    key = lineups.lineup_key(_seats(teams))
+    unpacked = lineups.unpack_key(key)
+    assert lineups.key_flags(key) & lineups.ROLE_AGNOSTIC
+    # both halves switch to sorted ids so side swaps stay comparable
+    assert unpacked["BLUE"] == sorted(lineups.champion_id(c) for c in BLUE)
+    assert unpacked["RED"] == sorted(lineups.champion_id(c) for c in RED)
+    assert key == lineups.lineup_key(_seats(_teams()), role_agnostic=True)
+
+
+def test_key_to_hex_is_fixed_width():
+    width = lineups.KEY_BYTES * 2
+    assert len(lineups.key_to_hex(0)) == width
+    assert len(lineups.key_to_hex(lineups.lineup_key(_seats(_teams())))) == width
+    agnostic = lineups.lineup_key(_seats(_teams()), side_agnostic=True, role_agnostic=True)
+    assert len(lineups.key_to_hex(agnostic)) == width
+
+
+def test_unknown_champion_is_rejected():
+    assert lineups.champion_id("Not A Champion") == lineups.UNKNOWN_CHAMPION
+    assert lineups.champion_id("") == 0
+    with pytest.raises(lineups.UnknownChampionError):
+        _seats(_teams(blue=["Garen", "Lee Sin", "Ahri", "Jinx", "Nobody"]))
+
+
+def test_missing_side_is_rejected():
+    teams = _teams()
+    teams[3]["side"] = None
+    with pytest.raises(lineups.InvalidLineupError):
+        lineups.lineup_key(_seats(teams))
+
+
+def test_more_than_five_per_side_is_rejected():
+    teams = _teams()
+    for t in teams[:7]:
+        t["side"] = "BLUE"
+    with pytest.raises(lineups.InvalidLineupError):
+        lineups.lineup_key(_seats(teams))
@@ -0,0 +1,122 @@
+import os
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import lineups
+import match_store
+
+N_MATCHES = 3000
+N_PLAYERS = 120
+N_LINEUPS = 25
+
+
+def _handler():
+    # handler builds boto3 clients at import time; only a region is needed
+    pytest.importorskip("boto3")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    import handler
+
+    return handler
+
+
+def _synthetic_matches(seed=11):
+    rng = random.Random(seed)
+    champ_ids = sorted(lineups.CHAMPION_IDS.values())
+    # display names differ from the upper-case lineups keys on purpose
+    display = {cid: name.title() + "!" for name, cid in lineups.CHAMPION_IDS.items()}
+    pool = [rng.sample(champ_ids, 10) for _ in range(N_LINEUPS)]
+    puuids = [f"puuid-{i:04d}" for i in range(N_PLAYERS)]
+    matches = []
+    for i in range(N_MATCHES):
+        champs = rng.choice(pool)
+        players = rng.sample(puuids, 10)
+        blue_win = rng.random() < 0.5
+        start = 1_700_000_000_000 + i * 60_000
+        participants = []
+        for j in range(10):
+            participants.append(
+                {
+                    "puuid": players[j],
+                    "championId": champs[j],
+                    "championName": display[champs[j]],
+                    "teamId": 100 if j < 5 else 200,
+                    "teamPosition": lineups.ROLES[j % 5],
+                    "kills": rng.randint(0, 15),
+                    "deaths": rng.randint(0, 12),
+                    "assists": rng.randint(0, 20),
+                    "totalMinionsKilled": rng.randint(0, 300),
+                    "neutralMinionsKilled": rng.randint(0, 60),
+                    "goldEarned": rng.randint(4000, 20000),
+                    "win": blue_win if j < 5 else not blue_win,
+                }
+            )
+        matches.append(
+            {
+                "metadata": {"matchId": f"NA1_{i}"},
+                "info": {
+                    "gameCreation": start,
+                    "gameStartTimestamp": start,
+                    "gameDuration": rng.randint(900, 2700),
+                    "participants": participants,
+                },
+            }
+        )
+    return matches
+
+
+@pytest.fixture(scope="module")
+def synthetic(tmp_path_factory):
+    matches = _synthetic_matches()
+    store = match_store.MatchStore(str(tmp_path_factory.mktemp("store")))
+    for m in matches:
+        assert store.append_match(m)
+    store.flush()
+    return store, matches
+
+
+def test_player_overview_matches_handler(synthetic):
+    handler = _handler()
+    store, matches = synthetic
+    newest_first = sorted(matches, key=lambda m: m["info"]["gameStartTimestamp"], reverse=True)
+    for i in range(0, N_PLAYERS, 7):
+        puuid = f"puuid-{i:04d}"
+        mine = [m for m in newest_first if any(p["puuid"] == puuid for p in m["info"]["participants"])]
+        expected, _recent = handler._overview_from_matches(puuid, mine)
+        assert store.player_overview(puuid) == expected
+
+
+def test_peer_medians_match_handler(synthetic):
+    handler = _handler()
+    store, matches = synthetic
+    by_key = {}
+    for m in matches:
+        key = lineups.key_to_hex(lineups.lineup_key(lineups.seats_from_match(m)))
+        by_key.setdefault(key, []).append(m)
+    assert len(by_key) == N_LINEUPS
+    for key, ms in by_key.items():
+        assert store.peer_medians(key) == handler._aggregate_peer_medians(ms)
+        assert len(store.lineup_row_slices(key)) == len(ms)
+
+
+def test_partial_lineup_key_survives_the_s21_index(tmp_path):
+    # only BLUE seats: the RED half, and so the key's last 10 bytes, are zero
+    teams = [
+        {"side": "BLUE", "role": role, "champ": champ, "puuid": f"p{j}", "k": 1, "d": 1, "a": 1}
+        for j, (role, champ) in enumerate(zip(lineups.ROLES, ["Garen", "Vi", "Ahri", "Jinx", "Lulu"]))
+    ]
+    key = lineups.key_to_hex(lineups.lineup_key(lineups.seats_from_teams(teams)))
+    assert lineups.key_to_bytes(lineups.key_from_hex(key)).endswith(b"\0" * 10)
+
+    store = match_store.MatchStore(str(tmp_path))
+    for i in range(3):
+        store.append_match({"match_id": f"P{i}", "start_ms": i, "duration_s": 1800, "teams": teams})
+    other = [dict(t, champ="Zed") if t["role"] == "UTILITY" else t for t in teams]
+    store.append_match({"match_id": "OTHER", "start_ms": 9, "duration_s": 1800, "teams": other})
+    store.flush()
+
+    for s in (store, match_store.MatchStore(str(tmp_path))):  # in memory and reopened from disk
+        assert sorted(s.lineup_match_idxs(key).tolist()) == [0, 1, 2]
+        assert len(s.lineup_rows(key)) == 15
@@ -0,0 +1,172 @@
+import socket
+import threading
+import time
+import types
+import urllib.error
+
+import pytest
+
+import riot_http
+
+MATCH = "https://americas.api.riotgames.com/lol/match/v5/matches/NA1_5123"
+HOST = "americas.api.riotgames.com"
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def monotonic(self):
+        return self.t
+
+    def sleep(self, s):
+        self.t += s
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(riot_http, "latency", riot_http.LatencyTracker())
+    monkeypatch.setattr(riot_http, "breaker", riot_http.CircuitBreaker())
+    monkeypatch.setattr(riot_http, "_counts", {"requests": 0, "hedges": 0})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = FakeClock()
+    monkeypatch.setattr(riot_http, "time", types.SimpleNamespace(monotonic=c.monotonic, sleep=c.sleep))
+    return c
+
+
+@pytest.mark.parametrize(
+    "url, route",
+    [
+        (MATCH, "/lol/match/v5/matches/{id}"),
+        (MATCH + "/timeline", "/lol/match/v5/matches/{id}/timeline"),
+        (
+            "https://americas.api.riotgames.com/lol/match/v5/matches/by-puuid/Ab-_c9/ids?count=10",
+            "/lol/match/v5/matches/by-puuid/{id}/ids",
+        ),
+        (
+            "https://americas.api.riotgames.com/riot/account/v1/accounts/by-riot-id/faker/kr1",
+            "/riot/account/v1/accounts/by-riot-id/{id}/{id}",
+        ),
+        (
+            "https://na1.api.riotgames.com/lol/league-exp/v4/entries/RANKED_SOLO_5x5/GOLD/I?page=2",
+            "/lol/league-exp/v4/entries/{id}/{id}/{id}",
+        ),
+        ("https://na1.api.riotgames.com/lol/summoner/v4/summoners/Q2lmMGx0", "/lol/summoner/v4/summoners/{id}"),
+    ],
+)
+def test_endpoint_key_templates(url, route):
+    host, method, got = riot_http.endpoint_key(url)
+    assert (method, got) == ("GET", route)
+    assert host == riot_http.urllib.parse.urlsplit(url).netloc
+
+
+def test_slow_route_does_not_lock_in_min_timeout(clock, monkeypatch):
+    state = {"latency": 0.05}
+
+    def fetch(url, headers, timeout):
+        if state["latency"] > timeout:
+            clock.t += timeout
+            raise socket.timeout("timed out")
+        clock.t += state["latency"]
+        return {"ok": True}
+
+    monkeypatch.setattr(riot_http, "_fetch", fetch)
+    for _ in range(50):
+        riot_http.get_json(MATCH, hedge=False)
+    key = riot_http.endpoint_key(MATCH)
+    assert riot_http.latency.timeout_for(key) == riot_http.MIN_TIMEOUT_S
+
+    state["latency"] = 2.0  # Riot slows down for good
+    outcomes = []
+    for _ in range(30):
+        try:
+            riot_http.get_json(MATCH, hedge=False)
+            outcomes.append("ok")
+        except Exception as e:
+            outcomes.append(type(e).__name__)
+
+    assert "CircuitOpenError" not in outcomes  # capped timeouts aren't host failures
+    assert outcomes.count("ok") >= 28
+    assert outcomes[-20:] == ["ok"] * 20
+    assert riot_http.latency.timeout_for(key) > 2.0
+
+
+def test_half_open_probe_uses_default_timeout(clock, monkeypatch):
+    monkeypatch.setattr(riot_http, "breaker", riot_http.CircuitBreaker(failures=2, cooldown_s=10))
+    seen = {"timeouts": [], "fail": True, "concurrent": None}
+
+    def fetch(url, headers, timeout):
+        seen["timeouts"].append(timeout)
+        if seen["fail"]:
+            raise urllib.error.HTTPError(url, 503, "unavailable", {}, None)
+        try:
+            riot_http.breaker.before(HOST)  # another caller while the probe is out
+        except riot_http.CircuitOpenError as e:
+            seen["concurrent"] = e
+        return {"ok": True}
+
+    monkeypatch.setattr(riot_http, "_fetch", fetch)
+    for _ in range(2):
+        with pytest.raises(urllib.error.HTTPError):
+            riot_http.get_json(MATCH, hedge=False)
+    with pytest.raises(riot_http.CircuitOpenError):
+        riot_http.get_json(MATCH, hedge=False)
+
+    clock.t += 11
+    seen["fail"] = False
+    assert riot_http.get_json(MATCH, hedge=False) == {"ok": True}
+    assert seen["timeouts"][-1] == riot_http.DEFAULT_TIMEOUT_S
+    assert isinstance(seen["concurrent"], riot_http.CircuitOpenError)
+    assert riot_http.breaker.before(HOST) is False  # closed again
+
+
+def _hedge_fetch(monkeypatch, first_result, second_result):
+    release = threading.Event()
+    calls = []
+    lock = threading.Lock()
+
+    def fetch(url, headers, timeout):
+        with lock:
+            calls.append(url)
+            n = len(calls)
+        if n == 1:
+            release.wait(2)
+            return first_result()
+        return second_result()
+
+    monkeypatch.setattr(riot_http, "_fetch", fetch)
+    key = riot_http.endpoint_key(MATCH)
+    for _ in range(riot_http.MIN_SAMPLES * 2):
+        riot_http.latency.record(key, 0.01)
+    return key, release, calls
+
+
+def _raise(msg):
+    def f():
+        raise ValueError(msg)
+
+    return f
+
+
+def test_hedge_winner_is_recorded_and_loser_dropped(monkeypatch):
+    key, release, calls = _hedge_fetch(monkeypatch, lambda: {"from": "first"}, lambda: {"from": "second"})
+    before = len(riot_http.latency._samples[key])
+
+    assert riot_http.get_json(MATCH) == {"from": "second"}
+    assert len(calls) == 2
+    assert riot_http._counts["hedges"] == 1
+    assert len(riot_http.latency._samples[key]) == before + 1
+
+    release.set()  # the loser finishes late; its latency must not be recorded
+    time.sleep(0.1)
+    assert len(riot_http.latency._samples[key]) == before + 1
+
+
+def test_hedge_both_fail_raises_first_attempts_error(monkeypatch):
+    _key, release, _calls = _hedge_fetch(monkeypatch, _raise("first"), _raise("second"))
+    threading.Timer(0.2, release.set).start()
+    with pytest.raises(ValueError, match="first"):
+        riot_http.get_json(MATCH)
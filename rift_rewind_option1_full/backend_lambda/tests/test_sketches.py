@@ -0,0 +1,84 @@
+import bisect
+import random
+
+import pytest
+
+import sketches
+
+N = 20000
+# KLL rank error is ~1.7 / k; leave headroom for the randomized compaction
+MAX_RANK_ERROR = 0.03
+
+
+def _data(seed=7):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(1.0, 0.6) for _ in range(N)]
+
+
+def _rank(sorted_vals, x):
+    return bisect.bisect_right(sorted_vals, x) / float(len(sorted_vals))
+
+
+@pytest.mark.parametrize("q", [0.5, 0.9])
+def test_single_sketch_rank_error(q):
+    data = _data()
+    s = sketches.KLL(seed=1)
+    for x in data:
+        s.add(x)
+    assert s.n == N
+    assert abs(_rank(sorted(data), s.quantile(q)) - q) <= MAX_RANK_ERROR
+
+
+@pytest.mark.parametrize("q", [0.5, 0.9])
+def test_merged_shards_rank_error(q):
+    data = _data()
+    shards = [sketches.KLL(seed=i) for i in range(8)]
+    for i, x in enumerate(data):
+        shards[i % len(shards)].add(x)
+    merged = sketches.KLL(seed=99)
+    for s in shards:
+        merged.merge(s)
+    assert merged.n == N
+    assert merged.min == min(data) and merged.max == max(data)
+    assert abs(_rank(sorted(data), merged.quantile(q)) - q) <= MAX_RANK_ERROR
+
+
+def test_peer_stats_counts_games_not_participants():
+    stats = sketches.PeerStats()
+    for _ in range(3):
+        for _ in range(5):
+            stats.add_participant({"k": 3, "d": 2, "a": 5, "cs": 180, "gold": 10000}, 1800)
+        stats.add_game(True)
+    stats.add_game(False)
+    assert stats.games == 4
+    assert stats.samples == 15
+    assert stats.medians()["winrate"] == 0.75
+
+
+def test_peer_stats_bytes_round_trip():
+    rng = random.Random(3)
+    stats = sketches.PeerStats()
+    for _ in range(2000):
+        stats.add_participant(
+            {
+                "k": rng.randint(0, 15),
+                "d": rng.randint(0, 10),
+                "a": rng.randint(0, 20),
+                "cs": rng.randint(20, 300),
+                "gold": rng.randint(4000, 18000),
+            },
+            rng.randint(900, 2400),
+        )
+        stats.add_game(rng.random() < 0.5)
+
+    back = sketches.PeerStats.from_bytes(stats.to_bytes())
+    assert (back.games, back.wins, back.samples) == (stats.games, stats.wins, stats.samples)
+    assert back.percentiles() == stats.percentiles()
+    for m, v in stats.medians().items():
+        assert back.medians()[m] == pytest.approx(v, abs=1e-4)
+
+    # a decoded sketch keeps merging like the original
+    other = sketches.PeerStats.from_bytes(stats.to_bytes())
+    back.merge(other)
+    assert back.games == 2 * stats.games
+    assert back.samples == 2 * stats.samples
@@ -0,0 +1,186 @@
+import random
+
+import pytest
+
+import riot_http
+import riot_standin
+from watcher import watcher as w
+
+BASE = "http://riot.test"
+
+
+class FakeRiot:
+    """fetch() stand-in: ids newest first per puuid, match docs by id."""
+
+    def __init__(self):
+        self.history = {}
+        self.fail = False
+        self.urls = []
+
+    def play(self, puuid, *mids):
+        self.history[puuid] = list(reversed(mids)) + self.history.get(puuid, [])
+
+    def __call__(self, url):
+        self.urls.append(url)
+        if self.fail:
+            raise OSError("riot down")
+        path = url.split("?")[0]
+        if path.endswith("/ids"):
+            puuid = path.split("/by-puuid/")[1].split("/")[0]
+            return self.history.get(puuid, [])[: w.IDS_PER_POLL]
+        return {"metadata": {"matchId": path.rsplit("/", 1)[1]}}
+
+
+class Clock:
+    def __init__(self, t=1000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture
+def env():
+    random.seed(0)
+    riot, clock, sink = FakeRiot(), Clock(), w.ListSink()
+    watcher = w.Watcher(
+        w.MemoryStateStore(),
+        sink,
+        bucket=w.TokenBucket(1e6, 1e6),
+        fetch=riot,
+        base_url=BASE,
+        clock=clock,
+    )
+    return watcher, riot, clock, sink
+
+
+def _emitted(sink):
+    return [e["match_id"] for e in sink.events]
+
+
+def test_first_poll_is_a_baseline(env):
+    watcher, riot, clock, sink = env
+    riot.play("p1", "NA1_1", "NA1_2")
+    watcher.track("p1")
+    p = watcher._players["p1"]
+    assert watcher.poll(p) == []
+    assert sink.events == []
+    assert p.last_seen == "NA1_2"
+
+
+def test_new_matches_are_diffed_and_emitted_oldest_first(env):
+    watcher, riot, clock, sink = env
+    riot.play("p1", "NA1_1")
+    watcher.track("p1")
+    p = watcher._players["p1"]
+    watcher.poll(p)
+    riot.play("p1", "NA1_2", "NA1_3")
+    assert watcher.poll(p) == ["NA1_3", "NA1_2"]
+    assert _emitted(sink) == ["NA1_2", "NA1_3"]
+    assert p.last_seen == "NA1_3"
+    assert watcher.poll(p) == []  # nothing new the second time
+
+
+def test_player_without_history_emits_first_game(env):
+    watcher, riot, clock, sink = env
+    watcher.track("fresh")
+    p = watcher._players["fresh"]
+    watcher.poll(p)
+    assert p.last_seen == w.NO_HISTORY
+    riot.play("fresh", "NA1_1")
+    watcher.poll(p)
+    assert _emitted(sink) == ["NA1_1"]
+
+
+def test_more_than_a_page_of_games_emits_the_whole_page(env):
+    watcher, riot, clock, sink = env
+    riot.play("p1", "NA1_0")
+    watcher.track("p1")
+    p = watcher._players["p1"]
+    watcher.poll(p)
+    riot.play("p1", *[f"NA1_{i}" for i in range(1, w.IDS_PER_POLL + 6)])
+    assert len(watcher.poll(p)) == w.IDS_PER_POLL
+
+
+def test_backoff_and_reset(env):
+    watcher, riot, clock, sink = env
+    riot.play("p1", "NA1_1")
+    watcher.track("p1")
+    p = watcher._players["p1"]
+    watcher.poll(p)  # baseline: nothing new, backs off
+    assert p.interval == pytest.approx(w.MIN_INTERVAL_S * w.BACKOFF)
+    for _ in range(30):
+        watcher.poll(p)
+    assert p.interval == w.MAX_INTERVAL_S
+
+    clock.t += 10
+    riot.play("p1", "NA1_2")
+    watcher.poll(p)
+    assert p.interval == w.MIN_INTERVAL_S
+    assert p.last_new_at == clock.t
+    assert abs(p.next_poll - (clock.t + w.MIN_INTERVAL_S)) <= w.MIN_INTERVAL_S * w.JITTER
+
+
+def test_errors_keep_last_seen_and_reschedule(env):
+    watcher, riot, clock, sink = env
+    riot.play("p1", "NA1_1")
+    watcher.track("p1")
+    p = watcher._players["p1"]
+    watcher.poll(p)
+    riot.play("p1", "NA1_2")
+    riot.fail = True
+    assert watcher.poll(p) == []
+    assert p.last_seen == "NA1_1"
+    assert watcher.stats["errors"] == 1
+    riot.fail = False
+    watcher.poll(p)
+    assert _emitted(sink) == ["NA1_2"]  # re-emitted on the next poll
+
+
+def test_scheduler_pops_due_players_in_order(env):
+    watcher, riot, clock, sink = env
+    for puuid, due in (("late", 50.0), ("soon", 10.0), ("gone", 5.0)):
+        watcher._push(w.TrackedPlayer(puuid, next_poll=clock.t + due))
+    watcher.untrack("gone")
+    assert watcher._pop_due(clock.t) is None
+    clock.t += 60
+    assert watcher._pop_due(clock.t).puuid == "soon"
+    assert watcher._pop_due(clock.t).puuid == "late"
+    assert watcher._pop_due(clock.t) is None  # untracked entry skipped
+
+
+def test_token_bucket_waits_for_refill():
+    t = {"now": 0.0}
+    slept = []
+
+    def sleep(s):
+        slept.append(s)
+        t["now"] += s
+
+    bucket = w.TokenBucket(rate_per_s=2, burst=2, clock=lambda: t["now"], sleep=sleep)
+    for _ in range(4):
+        bucket.acquire()
+    assert sum(slept) == pytest.approx(1.0)
+
+
+def test_watcher_against_standin():
+    server, standin = riot_standin.serve(latency_ms=1, game_every_s=3600)
+    try:
+        base = f"http://127.0.0.1:{server.server_port}"
+        watcher = w.Watcher(
+            w.MemoryStateStore(),
+            w.ListSink(),
+            bucket=w.TokenBucket(1e6, 1e6),
+            fetch=lambda url: riot_http.get_json(url, hedge=False),
+            base_url=base,
+        )
+        standin.started -= 5 * 3600  # five games already played
+        watcher.track("bench-1")
+        p = watcher._players["bench-1"]
+        watcher.poll(p)
+        assert p.last_seen == standin.match_ids("bench-1")[0]
+        standin.started -= 3600  # one more game
+        assert watcher.poll(p) == standin.match_ids("bench-1")[:1]
+        assert watcher.stats == {"polls": 2, "new_matches": 1, "errors": 0, "requests": 3}
+    finally:
+        server.shutdown()
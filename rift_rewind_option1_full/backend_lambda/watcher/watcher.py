@@ -0,0 +1,335 @@
+# watcher/watcher.py — new-match watcher for tracked players
+#
+# Polls matches/by-puuid/{puuid}/ids (the same endpoint _load_recent_matches
+# uses) for every tracked puuid, diffs against the last-seen match ID and only
+# downloads the new match documents. Players sit in a priority queue keyed by
+# their next poll time: a player who just finished a game is polled again
+# soon, an idle one backs off geometrically up to MAX_INTERVAL_S. Every Riot
+# call takes a token from one global bucket so the whole watcher stays under
+# the key's rate limit however many players are tracked.
+#
+# Scheduled Lambda entrypoint: watcher/watcher.handler (zip root backend_lambda/;
+# EventBridge, e.g. every minute).
+# Local benchmark against the Riot stand-in (run from backend_lambda/):
+#   python riot_standin.py --port 8080 --game-every-s 300
+#   python -m watcher.watcher --base-url http://127.0.0.1:8080 --players 2000 --seconds 30
+#
+# Delivery is at-least-once: last_seen only advances after the new matches
+# were emitted, so a failed poll re-emits on the next one. The token bucket is
+# per process; run the scheduled Lambda with reserved concurrency 1.
+import heapq
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.parse
+
+import riot_http
+
+RIOT_API_KEY = os.environ.get("RIOT_API_KEY", "")
+# "{region}" is replaced by the routing region; point at a stand-in for benchmarks
+RIOT_BASE_URL = os.environ.get("RIOT_BASE_URL", "https://{region}.api.riotgames.com")
+WATCHER_TABLE = os.environ.get("WATCHER_TABLE", "rr_watcher_players")
+WATCHER_QUEUE_URL = os.environ.get("WATCHER_QUEUE_URL", "")
+RATE_PER_S = float(os.environ.get("WATCHER_RATE_PER_S", "15"))
+RATE_BURST = float(os.environ.get("WATCHER_RATE_BURST", "20"))
+MIN_INTERVAL_S = float(os.environ.get("WATCHER_MIN_INTERVAL_S", "120"))
+MAX_INTERVAL_S = float(os.environ.get("WATCHER_MAX_INTERVAL_S", "3600"))
+BACKOFF = 1.6
+JITTER = 0.1
+IDS_PER_POLL = 20
+# last_seen after a baseline poll that found no matches; never equals a real
+# match ID, so the player's first game is diffed as new
+NO_HISTORY = ""
+
+
+# ===== Rate budget =====
+class TokenBucket:
+    def __init__(self, rate_per_s=RATE_PER_S, burst=RATE_BURST, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate_per_s)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.clock = clock
+        self.sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, n=1.0):
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.burst, self.tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                wait_s = (n - self.tokens) / self.rate
+            self.sleep(wait_s)
+
+
+# ===== Player state =====
+class TrackedPlayer:
+    __slots__ = ("puuid", "region", "last_seen", "interval", "next_poll", "last_new_at")
+
+    def __init__(self, puuid, region="americas", last_seen=None, interval=MIN_INTERVAL_S, next_poll=0.0, last_new_at=0.0):
+        self.puuid = puuid
+        self.region = region
+        self.last_seen = last_seen
+        self.interval = float(interval)
+        self.next_poll = float(next_poll)
+        self.last_new_at = float(last_new_at)
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**{k: d[k] for k in cls.__slots__ if k in d})
+
+
+class MemoryStateStore:
+    def __init__(self, players=()):
+        self.players = {p.puuid: p for p in players}
+
+    def load_all(self):
+        return list(self.players.values())
+
+    def save(self, player):
+        self.players[player.puuid] = player
+
+    def delete(self, puuid):
+        self.players.pop(puuid, None)
+
+
+class DynamoStateStore:
+    def __init__(self, table_name=WATCHER_TABLE):
+        import boto3
+
+        self.table = boto3.resource("dynamodb").Table(table_name)
+
+    def load_all(self):
+        out, kwargs = [], {}
+        while True:
+            res = self.table.scan(**kwargs)
+            for item in res.get("Items", []):
+                item = {k: (float(v) if k in ("interval", "next_poll", "last_new_at") else v) for k, v in item.items()}
+                out.append(TrackedPlayer.from_dict(item))
+            if "LastEvaluatedKey" not in res:
+                return out
+            kwargs["ExclusiveStartKey"] = res["LastEvaluatedKey"]
+
+    def save(self, player):
+        from decimal import Decimal
+
+        item = player.to_dict()
+        for k in ("interval", "next_poll", "last_new_at"):
+            item[k] = Decimal(str(round(item[k], 3)))
+        if item["last_seen"] is None:
+            del item["last_seen"]
+        self.table.put_item(Item=item)
+
+    def delete(self, puuid):
+        self.table.delete_item(Key={"puuid": puuid})
+
+
+# ===== Sinks =====
+class ListSink:
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event):
+        self.events.append(event)
+
+
+class StdoutSink:
+    def emit(self, event):
+        print(json.dumps(event, separators=(",", ":")))
+
+
+class SqsSink:
+    def __init__(self, queue_url=WATCHER_QUEUE_URL):
+        import boto3
+
+        self.sqs = boto3.client("sqs")
+        self.queue_url = queue_url
+
+    def emit(self, event):
+        self.sqs.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(event))
+
+
+# ===== Watcher =====
+def _riot_fetch(url):
+    # no hedging: a duplicate request would bypass the token bucket, which
+    # counts one call per _get, and spend rate-limit quota the bucket doesn't see
+    headers = {"X-Riot-Token": RIOT_API_KEY} if RIOT_API_KEY else {}
+    return riot_http.get_json(url, headers=headers, hedge=False)
+
+
+class Watcher:
+    def __init__(self, store, sink, bucket=None, fetch=_riot_fetch, base_url=RIOT_BASE_URL, clock=time.time):
+        self.store = store
+        self.sink = sink
+        self.bucket = bucket or TokenBucket()
+        self.fetch = fetch
+        self.base_url = base_url
+        self.clock = clock
+        self.stats = {"polls": 0, "new_matches": 0, "errors": 0, "requests": 0}
+        self._heap = []
+        self._players = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+        for p in store.load_all():
+            self._push(p)
+
+    def _push(self, player):
+        with self._lock:
+            self._players[player.puuid] = player
+            self._seq += 1
+            heapq.heappush(self._heap, (player.next_poll, self._seq, player.puuid))
+
+    def _pop_due(self, now):
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, puuid = heapq.heappop(self._heap)
+                p = self._players.get(puuid)
+                if p is not None and p.next_poll <= now:
+                    return p
+            return None
+
+    def track(self, puuid, region="americas"):
+        if puuid not in self._players:
+            p = TrackedPlayer(puuid, region, next_poll=self.clock())
+            self.store.save(p)
+            self._push(p)
+
+    def untrack(self, puuid):
+        with self._lock:
+            self._players.pop(puuid, None)  # stale heap entries are skipped
+        self.store.delete(puuid)
+
+    def _get(self, url):
+        self.bucket.acquire()
+        with self._lock:
+            self.stats["requests"] += 1
+        return self.fetch(url)
+
+    def _reschedule(self, p, found_new, now):
+        if found_new:
+            p.interval = MIN_INTERVAL_S
+            p.last_new_at = now
+        else:
+            p.interval = min(MAX_INTERVAL_S, p.interval * BACKOFF)
+        p.next_poll = now + p.interval * (1.0 + random.uniform(-JITTER, JITTER))
+        if p.puuid in self._players:
+            self.store.save(p)
+            self._push(p)
+
+    def poll(self, p):
+        base = self.base_url.format(region=p.region) + "/lol/match/v5"
+        new_ids = []
+        try:
+            ids = self._get(
+                f"{base}/matches/by-puuid/{urllib.parse.quote(p.puuid)}/ids?start=0&count={IDS_PER_POLL}"
+            ) or []
+            if p.last_seen is None:
+                pass  # first poll only records a baseline
+            elif p.last_seen in ids:
+                new_ids = ids[: ids.index(p.last_seen)]
+            else:
+                new_ids = ids  # more than IDS_PER_POLL games since last poll
+            # oldest first so the sink sees games in play order
+            for mid in reversed(new_ids):
+                match = self._get(f"{base}/matches/{urllib.parse.quote(mid)}")
+                self.sink.emit(
+                    {
+                        "type": "new_match",
+                        "puuid": p.puuid,
+                        "region": p.region,
+                        "match_id": mid,
+                        "match": match,
+                    }
+                )
+                with self._lock:
+                    self.stats["new_matches"] += 1
+            if ids:
+                p.last_seen = ids[0]
+            elif p.last_seen is None:
+                p.last_seen = NO_HISTORY
+        except Exception:
+            with self._lock:
+                self.stats["errors"] += 1
+        with self._lock:
+            self.stats["polls"] += 1
+        self._reschedule(p, bool(new_ids), self.clock())
+        return new_ids
+
+    def run(self, seconds, workers=4):
+        """Poll due players until `seconds` have elapsed; returns stats."""
+        deadline = self.clock() + seconds
+
+        def loop():
+            while True:
+                now = self.clock()
+                if now >= deadline:
+                    return
+                p = self._pop_due(now)
+                if p is None:
+                    with self._lock:
+                        nxt = self._heap[0][0] if self._heap else deadline
+                    time.sleep(min(1.0, max(0.01, min(nxt, deadline) - now)))
+                    continue
+                self.poll(p)
+
+        threads = [threading.Thread(target=loop, daemon=True) for _ in range(max(1, workers))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return dict(self.stats)
+
+
+def handler(event, context):
+    """
+    Scheduled run. event may carry {"track": [{"puuid", "region"}], "untrack": [puuid]}.
+    Runs until shortly before the Lambda deadline.
+    """
+    event = event or {}
+    w = Watcher(DynamoStateStore(), SqsSink() if WATCHER_QUEUE_URL else StdoutSink())
+    for t in event.get("track", []):
+        w.track(t["puuid"], t.get("region", "americas"))
+    for puuid in event.get("untrack", []):
+        w.untrack(puuid)
+    budget_s = 50.0
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        budget_s = max(1.0, context.get_remaining_time_in_millis() / 1000.0 - 5.0)
+    return {"ok": True, "stats": w.run(budget_s, workers=int(event.get("workers", 4)))}
+
+
+def _bench(argv):
+    import argparse
+
+    ap = argparse.ArgumentParser(description="benchmark the watcher against a Riot stand-in")
+    ap.add_argument("--base-url", required=True)
+    ap.add_argument("--players", type=int, default=1000)
+    ap.add_argument("--seconds", type=float, default=30.0)
+    ap.add_argument("--rate", type=float, default=RATE_PER_S)
+    ap.add_argument("--workers", type=int, default=4)
+    args = ap.parse_args(argv)
+
+    now = time.time()
+    store = MemoryStateStore(
+        TrackedPlayer(f"bench-{i}", next_poll=now + random.uniform(0, 1)) for i in range(args.players)
+    )
+    w = Watcher(store, ListSink(), bucket=TokenBucket(args.rate, args.rate), base_url=args.base_url)
+    t0 = time.monotonic()
+    stats = w.run(args.seconds, workers=args.workers)
+    elapsed = time.monotonic() - t0
+    stats["elapsed_s"] = round(elapsed, 2)
+    stats["requests_per_s"] = round(stats["requests"] / elapsed, 2)
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    _bench(sys.argv[1:])